@@ -2,14 +2,363 @@
 # File Created: 2023-10-01
 
 # Import libraries
+import argparse
+import bisect
+import contextlib
 import datetime
+import functools
+import gzip
+import hashlib
 import re
 import os
 import json
+import sqlite3
+import tempfile
 import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 from dotenv import load_dotenv
+import history
+import pages
+
+# Can be pointed at a local stand-in (see mock_wikidata.py)
+API_URL = os.environ.get("WD_API_URL", "https://www.wikidata.org/w/api.php")
+
+# Wikidata accepts up to 50 IDs per wbgetentities call
+BATCH_SIZE = 50
+# Titles per revision check (action=query&prop=info), and for accounts with apihighlimits (bots).
+# At 50 the check costs as many requests as fetching the claims, so it only pays off at 500
+INFO_BATCH_SIZE = 50
+HIGH_INFO_BATCH_SIZE = 500
+# Number of requests kept in flight against the Wikidata API
+MAX_WORKERS = 4
+# Request budget shared by all workers - this sets the overall speed of a run
+REQUESTS_PER_SECOND = 2
+
+# Wikidata Query Service, used by sweep mode to check the whole watch for deaths in a few queries
+SPARQL_URL = os.environ.get("WD_SPARQL_URL", "https://query.wikidata.org/sparql")
+# IDs per sweep query - short enough to stay well inside the query service's time limit
+SPARQL_BATCH_SIZE = 2000
+
+# Local cache of Wikidata entities, so re-runs don't hit the API again
+CACHE_PATH = "cache/wikidata.sqlite"
+CACHE_TTL = (
+    6 * 60 * 60
+)  # Seconds an entry is trusted when we don't know the current revision
+CACHE_MAX_AGE = 7 * 24 * 60 * 60  # Entries older than this are evicted
+CACHE_MAX_ENTRIES = 50000  # Beyond this, the oldest entries are evicted
+
+# Login cookies, so the next run can reuse a login that is still valid instead of logging in again.
+# Kept out of cache/, which GitHub Actions shares with other workflows, and not kept at all there
+SESSION_PATH = None if os.environ.get("GITHUB_ACTIONS") else ".wikidata_session.json"
+# Connection errors and server errors (but not 429s, which api_get handles) are retried this often
+HTTP_RETRIES = 3
+
+# Journal of the lookups made so far in the current run, so a failed run can be resumed
+CHECKPOINT_PATH = "cache/checkpoint.jsonl"
+
+# Timings and request counts for each run, oldest first
+METRICS_PATH = "data/run_metrics.json"
+METRICS_HISTORY = 400  # Runs kept in METRICS_PATH - over a year of daily runs
+
+# Imprecise dates of death (day 00) are rechecked daily for a week, then weekly for a month,
+# then monthly, so dates that Wikidata never makes precise stop costing requests every run
+IMPRECISE_DAILY_CHECKS = 7
+IMPRECISE_WEEKLY_CHECKS = 4
+# Requests per run for rechecking imprecise dates (each covers BATCH_SIZE people)
+IMPRECISE_BUDGET = 4
+
+# When lookups are prioritised, every ROTATION_EVERY-th batch goes to whoever was checked
+# longest ago, so people at lower risk still get checked in turn
+ROTATION_EVERY = 4
+
+# The dated copies of each day's reports. A day whose report is the same as the last one saved
+# isn't saved again - the manifest records which earlier file it is the same as
+OLD_DATA_DIR = "old_data"
+OLD_DATA_MANIFEST = "old_data/manifest.json"
+
+# Number of parsed old Alivewatch lists kept in memory
+SNAPSHOT_CACHE_SIZE = 16
+# Processes used to find positions at death in bulk - each reads a month of old lists
+POSITION_WORKERS = os.cpu_count() or 1
+
+# Notability rank places that one year of age is worth in risk_factor (see backtest.py for tuning it)
+RISK_AGE_WEIGHT = 6600
+
+# The watchlists to produce. The first profile is the main Alivewatch list; each of the others
+# gets a list of its own in PROFILES_DIR. Without a profiles file, only the main list is produced
+PROFILES_PATH = "profiles.json"
+PROFILES_DIR = "data/profiles"
+DEFAULT_PROFILE = {
+    "name": "Alivewatch",
+    "min_age": 85,
+    "minrank": 1000,  # minimum notability rank (excludes people who are too famous)
+    "maxrank": 100000,  # maximum notability rank (excludes people who are too obscure)
+}
+
+# The main dataset
+DATASET_PATH = "Alivewatch.csv.gz"
+# Rows read at a time in streaming mode, which never holds the whole main dataset in memory
+STREAM_CHUNK_SIZE = 100000
+# The small table of people the daily run works on, and the settings it was built with
+WATCH_TABLE_PATH = "Alivewatch_watch.csv"
+WATCH_TABLE_INFO_PATH = "Alivewatch_watch.json"
+# The columns whose changes are copied back into the main dataset
+STATUS_COLUMNS = [
+    "deathstamp",
+    "alivewatch?",
+    "date_added_to_alivewatch",
+    "position_at_death",
+]
+# Bookkeeping for the lookups, kept alongside the status columns and added to the dataset when missing:
+# the Wikidata revision last read, how often and when an imprecise date of death was last rechecked,
+# and when a living person was last checked
+TRACKING_COLUMNS = [
+    "lastrevid",
+    "imprecise_checks",
+    "imprecise_checked",
+    "last_checked",
+]
+# Columns that are read as text - dates, codes and positions must round-trip exactly.
+# deathstamp stays text because imprecise dates are stored with day 00, which isn't a valid date
+TEXT_COLUMNS = [
+    "name",
+    "wikidata_code",
+    "deathstamp",
+    "date_added_to_alivewatch",
+    "position_at_death",
+] + TRACKING_COLUMNS
+# Numeric columns, which are shrunk to the smallest type that holds them (e.g. int16 for birth)
+NUMERIC_COLUMNS = ["birth", "ranking_visib_5criteria", "alivewatch?"]
+# Columns with only a few distinct values
+CATEGORY_COLUMNS = ["level3_main_occ", "area1_of_rattachment"]
+# The columns report() uses
+REPORT_COLUMNS = [
+    "name",
+    "level3_main_occ",
+    "area1_of_rattachment",
+    "birth",
+    "ranking_visib_5criteria",
+    "deathstamp",
+    "alivewatch?",
+    "date_added_to_alivewatch",
+    "position_at_death",
+]
+
+
+class BotSession(requests.Session):
+    """
+    A session logged in to Wikidata as the bot. Its connection pool holds a kept-alive connection for
+    each worker, connection errors and server errors are retried, and the login cookies are saved
+    so that the next run can reuse the login. api_get logs in again if the login expires mid-run.
+    """
+
+    def __init__(self, username, password, path=SESSION_PATH, workers=MAX_WORKERS):
+        super().__init__()
+        self.username = username
+        self.password = password
+        self.path = path
+        self.logins = (
+            0  # Logins made by this session, so workers don't all log in again at once
+        )
+        self.login_lock = threading.Lock()
+        self.rights = None  # The account's user rights, once logged_in has been called
+        self.headers.update(
+            {
+                "User-Agent": "AliveWatchBot/1.0 (https://github.com/Viperiser/alivewatch/)"
+            }
+        )
+        # GETs are read-only, so are safe to retry. POSTs are only retried at the query service,
+        # where they are read-only SPARQL queries - not at the API, where a POST is the login,
+        # whose token can't be sent twice
+        for prefix, methods in (
+            ("https://", ["GET"]),
+            ("http://", ["GET"]),
+            (SPARQL_URL, ["GET", "POST"]),
+        ):
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=1,
+                status_forcelist=[500, 502, 503, 504],
+                allowed_methods=methods,
+                raise_on_status=False,
+                respect_retry_after_header=False,  # 429s go to api_get, which slows the whole pool
+            )
+            self.mount(prefix, HTTPAdapter(pool_maxsize=workers, max_retries=retry))
+
+    def counted(self, response):
+        """
+        Adds a login request to the run's metrics.
+
+        Parameters:
+        response (requests.Response): The response.
+
+        Returns:
+        dict: The decoded JSON response.
+        """
+        METRICS.count("requests")
+        METRICS.count("bytes", len(response.content))
+        return response.json()
+
+    def load_cookies(self):
+        """
+        Loads the cookies saved by an earlier run.
+
+        Parameters:
+        None
+
+        Returns:
+        bool: True if there were cookies to load.
+        """
+        if self.path is None:
+            return False
+        try:
+            with open(self.path) as f:
+                cookies = json.load(f)
+        except (OSError, ValueError):
+            return False
+        for cookie in cookies:
+            self.cookies.set(**cookie)
+        return bool(cookies)
+
+    def save_cookies(self):
+        """
+        Saves the login cookies for the next run, unless there is nowhere to save them.
+        Only the owner can read the file.
+
+        Parameters:
+        None
+
+        Returns:
+        None
+        """
+        if self.path is None:
+            return
+        cookies = [
+            {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "expires": cookie.expires,
+                "secure": cookie.secure,
+            }
+            for cookie in self.cookies
+        ]
+
+        # The temporary file write_atomic makes is only readable by its owner
+        def write(tmp):
+            with open(tmp, "w") as f:
+                json.dump(cookies, f)
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        write_atomic(self.path, write)
+
+    def logged_in(self):
+        """
+        Checks with Wikidata whether the session is still logged in, and notes the account's rights.
+
+        Parameters:
+        None
+
+        Returns:
+        bool: True if it is.
+        """
+        try:
+            response = self.get(
+                API_URL,
+                params={
+                    "action": "query",
+                    "meta": "userinfo",
+                    "uiprop": "rights",
+                    "format": "json",
+                },
+                timeout=10,
+            )
+            userinfo = self.counted(response)["query"]["userinfo"]
+        except (requests.RequestException, ValueError, KeyError):
+            return False
+        self.rights = set(userinfo.get("rights", []))
+        return "anon" not in userinfo
+
+    def info_batch_size(self):
+        """
+        Returns the number of titles a revision check (see get_revisions) can ask about at once.
+        If the rights aren't known yet (the login was new this run), asks for them.
+
+        Parameters:
+        None
+
+        Returns:
+        int: HIGH_INFO_BATCH_SIZE if the account has apihighlimits, otherwise INFO_BATCH_SIZE.
+        """
+        if self.rights is None:
+            self.logged_in()
+        if "apihighlimits" in (self.rights or ()):
+            return HIGH_INFO_BATCH_SIZE
+        return INFO_BATCH_SIZE
+
+    def login(self):
+        """
+        Logs in with the bot password, replacing any earlier login, and saves the cookies.
+
+        Parameters:
+        None
+
+        Returns:
+        None
+        """
+        self.cookies.clear()
+
+        # Step 1: Get login token
+        token_response = self.get(
+            API_URL,
+            params={
+                "action": "query",
+                "meta": "tokens",
+                "type": "login",
+                "format": "json",
+            },
+        )
+        login_token = self.counted(token_response)["query"]["tokens"]["logintoken"]
+
+        # Step 2: Log in using the bot password
+        login_response = self.post(
+            API_URL,
+            data={
+                "action": "login",
+                "lgname": self.username,
+                "lgpassword": self.password,
+                "lgtoken": login_token,
+                "format": "json",
+            },
+        )
+        result = self.counted(login_response)
+        if result.get("login", {}).get("result") != "Success":
+            raise RuntimeError(f"Login failed: {result}")
+
+        self.logins += 1
+        self.save_cookies()
+
+    def relogin(self, logins):
+        """
+        Logs in again after the login has expired. When several workers find it has expired,
+        only the first logs in; the others carry on with the new login.
+
+        Parameters:
+        logins (int): The value of self.logins when the worker made the request that failed.
+
+        Returns:
+        None
+        """
+        with self.login_lock:
+            if self.logins == logins:
+                print("⚠️ The Wikidata login has expired - logging in again")
+                self.login()
 
 
 def get_authenticated_session():
@@ -19,370 +368,2117 @@ def get_authenticated_session():
     WD_USERNAME = os.environ.get("WD_USERNAME")
     WD_PASSWORD = os.environ.get("WD_PASSWORD")
 
-    if not WD_USERNAME or not WD_PASSWORD:
-        raise RuntimeError("Missing Wikidata credentials in environment")
+    if not WD_USERNAME or not WD_PASSWORD:
+        raise RuntimeError("Missing Wikidata credentials in environment")
+
+    session = BotSession(WD_USERNAME, WD_PASSWORD)
+
+    # Reuse the last run's login if it is still valid - one request instead of two
+    if session.load_cookies() and session.logged_in():
+        print("Reusing the saved Wikidata login")
+        return session
+
+    session.login()
+    return session
+
+
+def clean_name(name):
+    """
+    Cleans up the name of a person by removing underscores, leading/trailing quotes, and multiple spaces.
+
+    Parameters:
+    name (str): The name of the person to be cleaned.
+
+    Returns:
+    str: The cleaned name.
+    """
+    # Remove underscores and replace with spaces
+    name = name.replace("_", " ")
+    # Remove leading/trailing quotes
+    name = name.strip('"')
+    # Remove multiple spaces (if underscores were next to each other)
+    name = re.sub(r"\s+", " ", name).strip()
+    return name
+
+
+def clean_names(names):
+    """
+    Cleans up a whole column of names at once, in the same way as clean_name.
+
+    Parameters:
+    names (Series): The names to be cleaned.
+
+    Returns:
+    Series: The cleaned names.
+    """
+    return (
+        names.str.replace("_", " ")
+        .str.strip('"')
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
+
+def render_movement(movement):
+    """
+    Renders the movement of a person in a human-readable format.
+
+    Parameters:
+    movement (str): The movement of the person.
+
+    Returns:
+    str: The movement in a nice format.
+    """
+    if movement == "new entry":
+        return "🆕"
+    elif int(movement) > 0:
+        return "▼" + str(int(movement))
+    elif int(movement) < 0:
+        return "▲" + str(abs(int(movement)))
+    else:
+        return "–"
+
+
+class RateLimiter:
+    """
+    A token bucket shared by all the workers fetching from Wikidata.
+    When the server pushes back, the whole pool slows down, not just the worker that was refused.
+    """
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=MAX_WORKERS):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(
+                        self.burst, self.tokens + (now - self.updated) * self.rate
+                    )
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def back_off(self, seconds):
+        """
+        Pauses every worker for the given number of seconds and halves the request rate.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = 0
+            self.updated = max(self.updated, self.paused_until)
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def succeeded(self):
+        """
+        Lets the request rate creep back up after a back-off.
+        """
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+# Shared by every lookup in the process unless a caller supplies its own
+RATE_LIMITER = RateLimiter()
+
+
+class RequestBudget:
+    """
+    The requests a run may spend looking people up, and the time it may take, shared by all the workers.
+    Each batch takes a request from the budget just before it is sent; once the budget has run out,
+    the batches still waiting aren't sent. Cache hits don't need a request, so cost nothing.
+    """
+
+    def __init__(self, max_requests=None, deadline=None):
+        self.max_requests = max_requests
+        self.deadline = (
+            deadline  # time.monotonic() after which no more requests are sent
+        )
+        self.used = 0
+        self.stopped = None  # Why the budget ran out, once it has
+        self.lock = threading.Lock()
+
+    def take(self):
+        """
+        Takes a request from the budget, if there is one left.
+
+        Returns:
+        bool: True if the request may be sent.
+        """
+        with self.lock:
+            if self.max_requests is not None and self.used >= self.max_requests:
+                self.stopped = f"Out of requests ({self.max_requests})"
+            elif self.deadline is not None and time.monotonic() > self.deadline:
+                self.stopped = "Out of time"
+            else:
+                self.used += 1
+                return True
+            return False
+
+
+class RunMetrics:
+    """
+    Timings and counters for a run, saved to METRICS_PATH so that a run drifting towards
+    the GitHub Actions time limit shows up before it hits it.
+    The counters are shared by every worker; each phase records how much of each it used.
+    """
+
+    COUNTERS = [
+        "requests",
+        "rate_limited",
+        "retries",
+        "bytes",
+        "cache_hits",
+        "rows_scanned",
+    ]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        """
+        Clears the timings and counters, ready for a new run.
+        """
+        with self.lock:
+            self.started = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.clock = time.perf_counter()
+            self.counters = dict.fromkeys(self.COUNTERS, 0)
+            self.phases = {}
+
+    def count(self, name, n=1):
+        """
+        Adds to one of the counters.
+        """
+        with self.lock:
+            self.counters[name] += n
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Times a phase of the run. Can be used as a context manager or a decorator;
+        a phase that runs more than once (like find_death_position) accumulates.
+        """
+        with self.lock:
+            before = dict(self.counters)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            with self.lock:
+                phase = self.phases.setdefault(
+                    name, {"calls": 0, "wall": 0.0, **dict.fromkeys(self.COUNTERS, 0)}
+                )
+                phase["calls"] += 1
+                phase["wall"] += wall
+                for counter in self.COUNTERS:
+                    phase[counter] += self.counters[counter] - before[counter]
+
+    def summary(self, completed=True):
+        """
+        Returns the metrics for the run so far.
+
+        Parameters:
+        completed (bool): Whether the run finished without an error.
+
+        Returns:
+        dict: The start time, whether the run completed, the total wall time, the counters,
+        and the wall time and counters of each phase.
+        """
+        with self.lock:
+            phases = {
+                name: dict(phase, wall=round(phase["wall"], 3))
+                for name, phase in self.phases.items()
+            }
+            return {
+                "started": self.started,
+                "completed": completed,
+                "wall": round(time.perf_counter() - self.clock, 3),
+                "totals": dict(self.counters),
+                "phases": phases,
+            }
+
+    def save(self, completed=True, path=METRICS_PATH, keep=METRICS_HISTORY):
+        """
+        Adds the run to the metrics file, dropping the oldest runs beyond keep.
+
+        Parameters:
+        completed (bool): Whether the run finished without an error.
+        path (str): The metrics file.
+        keep (int): The number of runs to keep.
+
+        Returns:
+        dict: The metrics for the run.
+        """
+        run = self.summary(completed)
+        runs = []
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    runs = json.load(f)["runs"]
+            except (ValueError, KeyError):
+                print(f"⚠️ Could not read {path} - starting a new metrics history")
+        runs = (runs + [run])[-keep:]
+
+        # One run per line, so each day's commit of the file is a one-line diff
+        def write(tmp):
+            with open(tmp, "w") as f:
+                f.write('{"runs": [\n')
+                f.write(",\n".join(json.dumps(run) for run in runs))
+                f.write("\n]}\n")
+
+        write_atomic(path, write)
+        return run
+
+
+# Shared by every part of the run, like RATE_LIMITER
+METRICS = RunMetrics()
+
+
+def retry_after(response, default):
+    """
+    Returns how long the server asked us to wait, in seconds.
+
+    Parameters:
+    response (requests.Response): The response with status 429 (or 503).
+    default (float): The wait to use if there is no usable Retry-After header.
+
+    Returns:
+    float: The number of seconds to wait.
+    """
+    try:
+        return max(float(response.headers.get("Retry-After", default)), 1.0)
+    except (TypeError, ValueError):  # Retry-After can also be an HTTP date
+        return default
+
+
+def api_get(params, session, limiter, label, url=None, post=False, timeout=10):
+    """
+    Makes a GET request to the Wikidata API, waiting for the shared rate limiter and backing off on 429s.
+
+    Parameters:
+    params (dict): The query parameters for the request.
+    session (requests.Session): The authenticated session for making requests to Wikidata.
+    limiter (RateLimiter): The rate limiter shared by all workers.
+    label (str): A description of the request, for log messages.
+    url (str): The endpoint. Uses API_URL if None.
+    post (bool): If True, send the parameters as a POST form instead (for long SPARQL queries).
+    timeout (float): Seconds to wait for a response.
+
+    Returns:
+    dict: The decoded JSON response, or None if the request failed.
+    """
+    # Ask the API to fail rather than quietly answer as an anonymous user if the login has expired
+    bot = isinstance(session, BotSession) and url in (None, API_URL)
+    if bot:
+        params = dict(params, **{"assert": "user"})
+    for attempt in range(5):  # Try up to 5 times
+        limiter.acquire()
+        if attempt:
+            METRICS.count("retries")
+        try:
+            logins = session.logins if bot else 0
+            if post:
+                r = session.post(url or API_URL, data=params, timeout=timeout)
+            else:
+                r = session.get(url or API_URL, params=params, timeout=timeout)
+            METRICS.count("requests")
+            METRICS.count("bytes", len(r.content))
+            if r.status_code == 429:
+                METRICS.count("rate_limited")
+                wait = retry_after(r, 10 * (attempt + 1))
+                print(
+                    f"⚠️ Rate limited for {label}, slowing down for {wait} seconds..."
+                )
+                limiter.back_off(wait)
+                continue
+            elif r.status_code != 200:
+                print(f"⚠️ Bad response ({r.status_code}) for {label}")
+                return None
+
+            limiter.succeeded()
+            r_json = json.loads(r.content.decode("utf-8"))
+            if bot and r_json.get("error", {}).get("code") == "assertuserfailed":
+                session.relogin(logins)
+                continue
+            return r_json
+
+        except json.JSONDecodeError:
+            print(f"❌ JSON decode error for {label}")
+            return None
+        except Exception as e:
+            print(f"❌ General error for {label}: {e}")
+            return None
+
+    print(f"❌ Failed to get data for {label} after 5 attempts.")
+    return None
+
+
+def batch_label(ids):
+    """
+    Describes a batch of Wikidata IDs for log messages.
+
+    Parameters:
+    ids (list): The Wikidata IDs in the batch.
+
+    Returns:
+    str: The ID itself for a single ID, otherwise the first and last IDs and the batch size.
+    """
+    return ids[0] if len(ids) == 1 else f"{ids[0]}..{ids[-1]} ({len(ids)} IDs)"
+
+
+def get_entities(ids, session, limiter):
+    """
+    Fetches the claims for a batch of Wikidata IDs in a single wbgetentities request.
+
+    Parameters:
+    ids (list): Up to BATCH_SIZE Wikidata IDs.
+    session (requests.Session): The authenticated session for making requests to Wikidata.
+    limiter (RateLimiter): The rate limiter shared by all workers.
+
+    Returns:
+    dict: Maps each requested Wikidata ID to its entity, or None if the entity could not be fetched.
+    """
+    entities = {id: None for id in ids}
+    r_json = api_get(
+        {
+            "action": "wbgetentities",
+            "props": "claims",
+            "ids": "|".join(ids),
+            "format": "json",
+        },
+        session,
+        limiter,
+        batch_label(ids),
+    )
+    if r_json is None:
+        return entities
+
+    for key, entity in r_json.get("entities", {}).items():
+        # Redirected IDs come back under their target ID, so map them back
+        key = entity.get("redirects", {}).get("from", key)
+        if key in entities and "missing" not in entity:
+            entities[key] = entity
+    return entities
+
+
+def get_revisions(ids, session, limiter):
+    """
+    Fetches the latest revision ID of a batch of Wikidata items in a single request.
+    This is much lighter than fetching their claims, so it is used to find out which items have changed.
+
+    Parameters:
+    ids (list): Up to HIGH_INFO_BATCH_SIZE Wikidata IDs (INFO_BATCH_SIZE without apihighlimits).
+    session (requests.Session): The authenticated session for making requests to Wikidata.
+    limiter (RateLimiter): The rate limiter shared by all workers.
+
+    Returns:
+    dict: Maps each requested Wikidata ID to its latest revision ID (as a string), or None if it could not be fetched.
+    """
+    revisions = {id: None for id in ids}
+    # A long list of titles goes in a POST body - as a URL it could be too long for the server
+    r_json = api_get(
+        {"action": "query", "prop": "info", "titles": "|".join(ids), "format": "json"},
+        session,
+        limiter,
+        batch_label(ids),
+        post=len(ids) > INFO_BATCH_SIZE,
+    )
+    if r_json is None:
+        return revisions
+
+    for page in r_json.get("query", {}).get("pages", {}).values():
+        if page.get("title") in revisions and "lastrevid" in page:
+            revisions[page["title"]] = str(page["lastrevid"])
+    return revisions
+
+
+def get_sparql_deaths(ids, session, limiter):
+    """
+    Asks the Wikidata Query Service which of a batch of Wikidata items have a date of death.
+    Any P570 statement counts, including 'unknown value', so nobody who has died is missed;
+    the detailed lookup then works out the date. Redirected items are followed.
+
+    Parameters:
+    ids (list): Up to SPARQL_BATCH_SIZE Wikidata IDs.
+    session (requests.Session): The session for making requests to Wikidata.
+    limiter (RateLimiter): The rate limiter shared by all workers.
+
+    Returns:
+    dict: Maps each requested Wikidata ID to True if it has a date of death, False if not,
+    or None if the query failed.
+    """
+    query = (
+        "SELECT DISTINCT ?item WHERE { VALUES ?item { "
+        + " ".join("wd:" + id for id in ids)
+        + " } { ?item p:P570 [] } UNION { ?item owl:sameAs/p:P570 [] } }"
+    )
+    r_json = api_get(
+        {"query": query, "format": "json"},
+        session,
+        limiter,
+        "sweep of " + batch_label(ids),
+        url=SPARQL_URL,
+        post=True,
+        timeout=60,
+    )
+    if r_json is None:
+        return {id: None for id in ids}
+    hits = {id: False for id in ids}
+    for binding in r_json.get("results", {}).get("bindings", []):
+        id = binding.get("item", {}).get("value", "").rsplit("/", 1)[-1]
+        if id in hits:
+            hits[id] = True
+    return hits
+
+
+def fetch_batches(
+    fetch,
+    ids,
+    session,
+    workers=MAX_WORKERS,
+    limiter=None,
+    batch_size=BATCH_SIZE,
+    budget=None,
+):
+    """
+    Splits the IDs into batches and runs fetch on them with up to `workers` requests in flight.
+    All workers share one rate limiter, so the speed of the run is set by REQUESTS_PER_SECOND.
+    Batches are sent in order, so with a budget the IDs at the start of the list are the ones fetched.
+
+    Parameters:
+    fetch (function): Called as fetch(batch, session, limiter); returns a dict keyed by ID.
+    ids (list): The Wikidata IDs to fetch.
+    session (requests.Session): The authenticated session for making requests to Wikidata.
+    workers (int): The maximum number of requests in flight.
+    limiter (RateLimiter): The shared rate limiter. Uses RATE_LIMITER if None.
+    batch_size (int): The number of IDs per request.
+    budget (RequestBudget): The run's request budget. The IDs of batches sent after it has run out
+        aren't yielded at all. None for no limit.
+
+    Yields:
+    tuple: (id, result) pairs, in the order the batches complete.
+    """
+    ids = list(dict.fromkeys(ids))  # Remove duplicates, keeping the original order
+    if not ids:
+        return
+    if limiter is None:
+        limiter = RATE_LIMITER
+    batches = [
+        ids[start : start + batch_size] for start in range(0, len(ids), batch_size)
+    ]
+
+    def run(batch):
+        if budget is not None and not budget.take():
+            return {}
+        return fetch(batch, session, limiter)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run, batch) for batch in batches]
+        try:
+            for future in as_completed(futures):
+                yield from future.result().items()
+        finally:
+            # If the caller stops early (e.g. out of time), don't send the remaining requests
+            for future in futures:
+                future.cancel()
+
+
+class EntityCache:
+    """
+    An SQLite store of Wikidata entities keyed by Wikidata ID and revision.
+    Only the parts of the entity that Alivewatch uses (the revision and the P570 claims) are kept.
+    An entry for a known revision is always valid, because revisions never change.
+    Otherwise an entry is trusted for CACHE_TTL seconds after it was fetched.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, refresh=False):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.refresh = (
+            refresh  # If True, ignore what is stored but still store new results
+        )
+        self.hits = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entities ("
+            "id TEXT, revid TEXT, fetched REAL, entity TEXT, PRIMARY KEY (id, revid))"
+        )
+
+    def get(self, id, revid=None):
+        """
+        Returns the cached entity for a Wikidata ID, or None if there is no usable entry.
+
+        Parameters:
+        id (str): The Wikidata ID.
+        revid (str): The current revision of the item, if known.
+
+        Returns:
+        dict: The cached entity, or None.
+        """
+        if self.refresh:
+            return None
+        if revid is not None:
+            row = self.conn.execute(
+                "SELECT entity FROM entities WHERE id = ? AND revid = ?", (id, revid)
+            ).fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT entity FROM entities WHERE id = ? AND fetched > ? "
+                "ORDER BY fetched DESC LIMIT 1",
+                (id, time.time() - self.ttl),
+            ).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        METRICS.count("cache_hits")
+        return json.loads(row[0])
+
+    def put(self, id, entity):
+        """
+        Stores an entity fetched from Wikidata.
+
+        Parameters:
+        id (str): The Wikidata ID it was requested under.
+        entity (dict): The entity, as returned by wbgetentities.
+
+        Returns:
+        None
+        """
+        claims = entity.get("claims", {})
+        trimmed = {
+            "id": entity.get("id", id),
+            "lastrevid": entity.get("lastrevid"),
+            "claims": {"P570": claims["P570"]} if "P570" in claims else {},
+        }
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?)",
+            (id, str(entity.get("lastrevid", "")), time.time(), json.dumps(trimmed)),
+        )
+
+    def close(self, max_age=CACHE_MAX_AGE, max_entries=CACHE_MAX_ENTRIES):
+        """
+        Evicts old entries, keeping at most max_entries, and saves the cache.
+
+        Parameters:
+        max_age (float): Entries older than this many seconds are removed.
+        max_entries (int): The maximum number of entries to keep - the most recently fetched are kept.
+
+        Returns:
+        None
+        """
+        self.conn.execute(
+            "DELETE FROM entities WHERE fetched < ?", (time.time() - max_age,)
+        )
+        self.conn.execute(
+            "DELETE FROM entities WHERE rowid NOT IN "
+            "(SELECT rowid FROM entities ORDER BY fetched DESC LIMIT ?)",
+            (max_entries,),
+        )
+        self.conn.commit()
+        self.conn.close()
+
+
+class Checkpoint:
+    """
+    An append-only journal of the death date lookups made in a run, written as each lookup completes.
+    If a run fails partway, a rerun with resume=True on the same day skips everyone already looked up.
+    The journal is cleared once a run succeeds, so a later run on the same day looks everyone up again.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, resume=False):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.run = todays_date()
+        self.resolved = {}  # Maps Wikidata ID to (date of death, revision)
+        kept = []  # Today's entries - other days' are dropped
+        if resume and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:  # A line cut short by the failure
+                        continue
+                    if entry["run"] == self.run:
+                        self.resolved[entry["id"]] = (entry["date"], entry["lastrevid"])
+                        kept.append(json.dumps(entry) + "\n")
+            print(f"Resuming: {len(self.resolved)} lookups already done today")
+        self.file = open(path, "w", encoding="utf-8")
+        self.file.writelines(kept)
+        self.file.flush()
+
+    def record(self, id, date, lastrevid):
+        """
+        Adds a completed lookup to the journal.
+
+        Parameters:
+        id (str): The Wikidata ID.
+        date (str): The date of death found, or an empty string.
+        lastrevid (str): The revision of the Wikidata item that was read.
+
+        Returns:
+        None
+        """
+        entry = {
+            "run": self.run,
+            "id": id,
+            "date": date,
+            "lastrevid": lastrevid,
+            "time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+
+    def close(self):
+        """
+        Closes the journal.
+
+        Parameters:
+        None
+
+        Returns:
+        None
+        """
+        self.file.close()
+
+    def clear(self):
+        """
+        Closes and deletes the journal, once the run it records has succeeded.
+
+        Parameters:
+        None
+
+        Returns:
+        None
+        """
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def cache_info(path=CACHE_PATH):
+    """
+    Prints a summary of the contents of the entity cache.
+
+    Parameters:
+    path (str): The location of the cache.
+
+    Returns:
+    None
+    """
+    if not os.path.exists(path):
+        print(f"No cache at {path}")
+        return
+    conn = sqlite3.connect(path)
+    count, oldest, newest, people = conn.execute(
+        "SELECT COUNT(*), MIN(fetched), MAX(fetched), COUNT(DISTINCT id) FROM entities"
+    ).fetchone()
+    fresh = conn.execute(
+        "SELECT COUNT(*) FROM entities WHERE fetched > ?", (time.time() - CACHE_TTL,)
+    ).fetchone()[0]
+    conn.close()
+    print(f"Cache: {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+    print(
+        f"Entries: {count} for {people} Wikidata IDs, "
+        f"{fresh} fetched in the last {CACHE_TTL // 3600} hours"
+    )
+    if count:
+        for label, stamp in (("Oldest", oldest), ("Newest", newest)):
+            when = datetime.datetime.fromtimestamp(stamp).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"{label} entry: {when}")
+
+
+def iter_entities(
+    ids,
+    session,
+    cache=None,
+    revisions=None,
+    workers=MAX_WORKERS,
+    limiter=None,
+    budget=None,
+):
+    """
+    Yields the Wikidata entity for each ID, from the cache where possible and from Wikidata otherwise.
+    Entities fetched from Wikidata are added to the cache.
+
+    Parameters:
+    ids (list): The Wikidata IDs to fetch.
+    session (requests.Session): The authenticated session for making requests to Wikidata.
+    cache (EntityCache): The entity cache. If None, everything is fetched from Wikidata.
+    revisions (dict): The current revision of each ID, if known - lets older cache entries be used.
+    workers (int): The maximum number of requests in flight.
+    limiter (RateLimiter): The shared rate limiter. Uses RATE_LIMITER if None.
+    budget (RequestBudget): The run's request budget, spent only on entities not in the cache.
+        Entities it doesn't stretch to aren't yielded. None for no limit.
+
+    Yields:
+    tuple: (id, entity), where entity is None if it could not be fetched.
+    """
+    revisions = revisions or {}
+    missing = []
+    for id in dict.fromkeys(ids):
+        entity = cache.get(id, revisions.get(id)) if cache is not None else None
+        if entity is None:
+            missing.append(id)
+        else:
+            yield id, entity
+
+    for id, entity in fetch_batches(
+        get_entities, missing, session, workers, limiter, budget=budget
+    ):
+        if cache is not None and entity is not None:
+            cache.put(id, entity)
+        yield id, entity
+
+
+# Date of death is property P570
+def parse_deathdate(entity):
+    """
+    Extracts the date of death from a Wikidata entity.
+
+    Parameters:
+    entity (dict): The Wikidata entity, as returned by wbgetentities, or None.
+
+    Returns:
+    str: The date of death in the format YYYY-MM-DD, or an empty string if no date is found.
+    """
+    if entity is None or "P570" not in entity.get("claims", {}):
+        return ""
+    try:
+        dt = entity["claims"]["P570"][0]["mainsnak"]["datavalue"]["value"]["time"]
+    except KeyError:  # 'unknown value' or 'no value' snaks have no datavalue
+        return ""
+    return dt[1:11]  # trim to YYYY-MM-DD
+
+
+def iter_deathdates(ids, session, workers=MAX_WORKERS, limiter=None, cache=None):
+    """
+    Looks up the dates of death for a list of Wikidata IDs, yielding results as each batch completes.
+
+    Parameters:
+    ids (list): The Wikidata IDs of the people.
+    session (requests.Session): The authenticated session for making requests to Wikidata.
+    workers (int): The maximum number of requests in flight.
+    limiter (RateLimiter): The shared rate limiter. Uses RATE_LIMITER if None.
+    cache (EntityCache): The entity cache. If None, everything is fetched from Wikidata.
+
+    Yields:
+    tuple: (id, date of death in the format YYYY-MM-DD, or an empty string if no date is found)
+    """
+    for id, entity in iter_entities(
+        ids, session, cache, workers=workers, limiter=limiter
+    ):
+        yield id, parse_deathdate(entity)
+
+
+def deathdates(ids, session, workers=MAX_WORKERS, limiter=None, cache=None):
+    """
+    Returns the dates of death for a list of Wikidata IDs, fetching up to BATCH_SIZE IDs per request.
+
+    Parameters:
+    ids (list): The Wikidata IDs of the people.
+    session (requests.Session): The authenticated session for making requests to Wikidata.
+    workers (int): The maximum number of requests in flight.
+    limiter (RateLimiter): The shared rate limiter. Uses RATE_LIMITER if None.
+    cache (EntityCache): The entity cache. If None, everything is fetched from Wikidata.
+
+    Returns:
+    dict: Maps each Wikidata ID to its date of death in the format YYYY-MM-DD, or an empty string if no date is found.
+    """
+    return dict(iter_deathdates(ids, session, workers, limiter, cache))
+
+
+def deathdate(id, session, cache=None):
+    """
+    Returns the date of death for a given Wikidata ID.
+
+    Parameters:
+    id (str): The Wikidata ID of the person.
+    session (requests.Session): The authenticated session for making requests to Wikidata.
+    cache (EntityCache): The entity cache. If None, the date is fetched from Wikidata.
+
+    Returns:
+    str: The date of death in the format YYYY-MM-DD, or an empty string if no date is found.
+    """
+    return deathdates([id], session, cache=cache)[id]
+
+
+def todays_date():
+    """
+    Returns today's date in the format YYYY-MM-DD.
+
+    Parameters:
+    None
+
+    Returns:
+    str: Today's date in the format YYYY-MM-DD.
+    """
+    # Returns today's date in format YYYY-MM-DD
+    now = datetime.datetime.now()
+    year = str(now.year)
+    month = str(now.month)
+    if len(month) == 1:
+        month = "0" + month
+    day = str(now.day)
+    if len(day) == 1:
+        day = "0" + day
+    return year + "-" + month + "-" + day
+
+
+def compare_dates(date1, date2):
+    """
+    Compares two dates in the format YYYY-MM-DD. Returns True if date1 is later than date2.
+
+    Parameters:
+    date1 (str): The first date to compare.
+    date2 (str): The second date to compare.
+
+    Returns:
+    bool: True if date1 is later than date2, False otherwise. If date1 is blank, returns False. If date2 is blank, returns True.
+
+    """
+    if date1 == "":
+        return False
+    elif date2 == "":
+        return True
+    else:
+        year1 = int(date1[0:4])
+        year2 = int(date2[0:4])
+        if year1 > year2:
+            return True
+        elif year1 < year2:
+            return False
+        else:
+            month1 = int(date1[5:7])
+            month2 = int(date2[5:7])
+            if month1 > month2:
+                return True
+            elif month1 < month2:
+                return False
+            else:
+                day1 = int(date1[8:10])
+                day2 = int(date2[8:10])
+                if day1 > day2:
+                    return True
+                else:
+                    return False
+
+
+def snapshot_dates(directory=history.HISTORY_DIR):
+    """
+    Returns the dates of all the old Alivewatch lists in the history, oldest first.
+
+    Parameters:
+    directory (str): The history directory.
+
+    Returns:
+    list: The dates, in the format YYYY-MM-DD.
+    """
+    return history.snapshot_dates("On_Alivewatch", directory)
+
+
+def latest_snapshot(date, inclusive=False, directory=history.HISTORY_DIR):
+    """
+    Finds the most recent old Alivewatch list from before a given date.
+
+    Parameters:
+    date (str): The date in the format YYYY-MM-DD.
+    inclusive (bool): If True, a list from the date itself also counts.
+    directory (str): The history directory.
+
+    Returns:
+    str: The date of the list, in the format YYYY-MM-DD, or None if there is no earlier list.
+    """
+    dates = snapshot_dates(directory)
+    if inclusive:
+        i = bisect.bisect_right(dates, date)
+    else:
+        i = bisect.bisect_left(dates, date)
+    return dates[i - 1] if i > 0 else None
+
+
+@functools.lru_cache(maxsize=SNAPSHOT_CACHE_SIZE)
+def load_snapshot(date, directory=history.HISTORY_DIR):
+    """
+    Reads an old Alivewatch list and indexes it by person.
+    The format of the lists has changed over time, so this evens out the differences:
+    names are cleaned (they were stored raw until February 2025), and dates added are
+    converted to YYYY-MM-DD (they were DD/MM/YYYY until January 2024).
+
+    Parameters:
+    date (str): The date of the list, in the format YYYY-MM-DD.
+    directory (str): The history directory.
+
+    Returns:
+    dict: Maps (name, date added) to the person's position in the list, counting from 1.
+    """
+    df = history.read_snapshot("On_Alivewatch", date, directory)
+    namefield = "Name" if "Name" in df.columns else "name"
+    datefield = (
+        "Date Added to Alivewatch"
+        if "Date Added to Alivewatch" in df.columns
+        else "date_added_to_alivewatch"
+    )
+    names = clean_names(df[namefield])
+    added = df[datefield].str.replace(
+        r"^(\d{2})/(\d{2})/(\d{4})$", r"\3-\2-\1", regex=True
+    )
+    positions = {}
+    for position, key in enumerate(zip(names, added), start=1):
+        positions.setdefault(key, position)  # The first match wins
+    return positions
+
+
+def death_position_source(name, addeddate, death_date, directory=history.HISTORY_DIR):
+    """
+    Works out which old Alivewatch list a person's position at death is read from, and how to find them in it.
+
+    Parameters:
+    name (str): The person's name, as in the dataset.
+    addeddate (str): The date the person was added to Alivewatch.
+    death_date (str): The date of death in the format YYYY-MM-DD, or ' ' if they haven't died.
+    directory (str): The history directory.
+
+    Returns:
+    tuple: (date of the list, (name, date added)) to look the person up in the list with, or
+    (None, position) if the position is known without looking: '' if they haven't died yet,
+    'n/k' if there is no list to look in.
+    """
+    # If no death date is found, return empty string - they haven't died yet
+    if death_date == " ":
+        return None, ""
+
+    # If date of death is before 2024-01-03, return 'n/k' - this is when the ranking system was introduced
+    if compare_dates("2024-01-03", death_date):
+        return None, "n/k"
+
+    # Find the latest list from before the death date
+    latest = latest_snapshot(death_date, directory=directory)
+    # If no list is found, return 'n/k'
+    if latest is None:
+        return None, "n/k"
+
+    # Before 2024-01-05, the lists recorded the date of the list itself as the date added
+    if compare_dates("2024-01-05", latest):
+        addeddate = latest
+
+    # Look the person up by name, using the date added for disambiguation
+    return latest, (clean_name(name), addeddate)
+
+
+def find_death_position(data, id, death_date=None):
+    """
+    Finds the position in Alivewatch at the time of death, for a given Wikidata ID.
+    Returns the position as a string or 'n/k' if not found.
+
+    Parameters:
+    data (DataFrame): The DataFrame containing Alivewatch data.
+    id (str): The Wikidata ID of the person.
+    death_date (str): The date of death in the format YYYY-MM-DD. If None, uses the death date from the DataFrame.
+
+    Returns:
+    str: The position at the time of death or 'n/k' if not found.
+    """
+    rows = data.index[data["wikidata_code"] == id][:1]
+    death_dates = None if death_date is None else pd.Series(death_date, index=rows)
+    return death_positions(data, rows, death_dates, workers=1)[rows[0]]
+
+
+def snapshot_positions(wanted, directory=history.HISTORY_DIR):
+    """
+    Looks people up in some old Alivewatch lists, reading each list once.
+    Runs in the worker processes of death_positions.
+
+    Parameters:
+    wanted (dict): Maps the date of each list to the (name, date added) keys to look up in it.
+    directory (str): The history directory.
+
+    Returns:
+    dict: Maps the date of each list to a dict of the keys found in it and their positions.
+    """
+    found = {}
+    for date, keys in wanted.items():
+        positions = load_snapshot(date, directory)
+        found[date] = {key: positions[key] for key in keys if key in positions}
+    return found
+
+
+@METRICS.phase("find_death_position")
+def death_positions(
+    data,
+    rows,
+    death_dates=None,
+    workers=POSITION_WORKERS,
+    directory=history.HISTORY_DIR,
+):
+    """
+    Finds the positions in Alivewatch at the time of death of many people at once (see find_death_position).
+    The people are grouped by the old list their position is read from, so each list is read once,
+    and each month's lists are read in a worker process of their own.
+
+    Parameters:
+    data (DataFrame): The DataFrame containing Alivewatch data.
+    rows (Index): The rows of the people to find.
+    death_dates (Series): Their dates of death, indexed by row. If None, uses the death dates from the DataFrame.
+    workers (int): The most processes to use. With 1, or only one month of lists to read, no processes are started.
+    directory (str): The history directory.
+
+    Returns:
+    Series: The position at the time of death of each person, or 'n/k' if not found, indexed by row.
+    """
+    if death_dates is None:
+        death_dates = data.loc[rows, "deathstamp"]
+    results = pd.Series("", index=rows, dtype=object)
+    wanted = {}  # Month -> list date -> keys
+    sources = {}
+    for row in rows:
+        date, key = death_position_source(
+            data.at[row, "name"],
+            data.at[row, "date_added_to_alivewatch"],
+            death_dates[row],
+            directory,
+        )
+        if date is None:
+            results[row] = key
+        else:
+            sources[row] = (date, key)
+            wanted.setdefault(date[:7], {}).setdefault(date, set()).add(key)
+
+    found = {}
+    if workers > 1 and len(wanted) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(wanted))) as pool:
+            tasks = [
+                pool.submit(snapshot_positions, month, directory)
+                for month in wanted.values()
+            ]
+            for task in tasks:
+                found.update(task.result())
+    else:
+        for month in wanted.values():
+            found.update(snapshot_positions(month, directory))
+
+    for row, (date, key) in sources.items():
+        position = found[date].get(key)
+        results[row] = "n/k" if position is None else str(position)  # Name not found
+    return results
+
+
+def render_movements(movements):
+    """
+    Renders a whole column of movements in a human-readable format, in the same way as render_movement.
+
+    Parameters:
+    movements (Series): The change in position of each person, or NaN for people who are new to the list.
+
+    Returns:
+    Series: The movements in a nice format.
+    """
+    rendered = pd.Series("–", index=movements.index, dtype=object)
+    down = movements > 0
+    up = movements < 0
+    rendered[down] = "▼" + movements[down].astype(int).astype(str)
+    rendered[up] = "▲" + (-movements[up]).astype(int).astype(str)
+    rendered[movements.isna()] = render_movement("new entry")
+    return rendered
+
+
+def movement_column(days):
+    """
+    Returns the name of the report column showing the change in position over a period.
+
+    Parameters:
+    days (int): The length of the period in days.
+
+    Returns:
+    str: The column name.
+    """
+    names = {
+        7: "Change Since Last Week",
+        30: "Change Since Last Month",
+        365: "Change Since Last Year",
+    }
+    return names.get(days, f"Change Over {days} Days")
+
+
+def movement_since(alive, days):
+    """
+    Works out how each person's position on Alivewatch has changed over a period,
+    by joining the current list to the list from the start of the period on name and date added.
+
+    Parameters:
+    alive (DataFrame): The current list, with 'priority', 'name' and 'date_added_to_alivewatch' columns.
+    days (int): The length of the period in days.
+
+    Returns:
+    Series: The movement of each person, rendered by render_movements.
+    """
+    then = datetime.datetime.now() - datetime.timedelta(days=days)
+    date = latest_snapshot(then.strftime("%Y-%m-%d"), inclusive=True)
+    positions = load_snapshot(date) if date is not None else {}
+    previous = pd.DataFrame(
+        [(name, added, position) for (name, added), position in positions.items()],
+        columns=["name", "date_added_to_alivewatch", "previous_position"],
+    )
+    merged = alive[["name", "date_added_to_alivewatch"]].merge(
+        previous, how="left", on=["name", "date_added_to_alivewatch"]
+    )
+    return render_movements(alive["priority"] - merged["previous_position"])
+
+
+def risk_factor(alive, maxyear, maxrank):
+    """
+    Scores how likely each person on Alivewatch is to die soon, from their age and notability.
+    Works on whole columns, so the list is scored in one go.
+
+    Parameters:
+    alive (DataFrame): The people on Alivewatch, with 'age' and 'ranking_visib_5criteria' columns.
+    maxyear (int): The maximum year of birth for people to be included in Alivewatch.
+    maxrank (int): The maximum notability rank for people to be included in Alivewatch.
+
+    Returns:
+    Series: The risk factor of each person - higher means more at risk.
+    """
+    thisyear = int(todays_date()[0:4])
+    return (
+        RISK_AGE_WEIGHT * alive["age"]
+        - alive["ranking_visib_5criteria"]
+        - RISK_AGE_WEIGHT * (thisyear - maxyear)
+        + maxrank
+    ) / 200000
+
+
+# The dataset as last read or written by this process, so update() and report() only parse it once
+_dataset_cache = {}
+
+
+def load_dataset(columns=None, path=DATASET_PATH):
+    """
+    Reads the Alivewatch dataset with compact column types.
+    The result is kept in memory, so later calls in the same process don't parse the file again
+    (unless it has changed on disk since).
+
+    Parameters:
+    columns (list): The columns to read. If None, reads all of them.
+    path (str): The location of the dataset.
+
+    Returns:
+    DataFrame: The dataset.
+    """
+    mtime = os.path.getmtime(path)
+    cached = _dataset_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        frame = cached[1]
+        if columns is None and cached[2]:
+            return frame[list(frame.columns)]
+        if columns is not None and set(columns) <= set(frame.columns):
+            return frame[[c for c in columns if c in frame.columns]]
+
+    frame = compact_types(pd.read_csv(path, **read_options(path, columns)))
+    remember_dataset(frame, path, complete=columns is None)
+    return frame[list(frame.columns)]
+
+
+def read_options(path, columns=None):
+    """
+    Returns the options for reading the Alivewatch dataset with pandas.read_csv.
+
+    Parameters:
+    path (str): The location of the dataset.
+    columns (list): The columns to read. If None, reads all of them.
+
+    Returns:
+    dict: The keyword arguments for pandas.read_csv.
+    """
+    # Only ask for columns that exist - the tracking columns aren't there until they are first used
+    header = pd.read_csv(path, nrows=0, compression="infer", encoding="utf-8")
+    usecols = None if columns is None else [c for c in columns if c in header.columns]
+    wanted = header.columns if usecols is None else usecols
+    return {
+        "usecols": usecols,
+        "na_filter": False,
+        "compression": "infer",
+        "encoding": "utf-8",
+        "dtype": {
+            **{c: str for c in TEXT_COLUMNS if c in wanted},
+            **{c: "category" for c in CATEGORY_COLUMNS if c in wanted},
+        },
+        "low_memory": False,
+    }
+
+
+def compact_types(frame):
+    """
+    Stores the numeric columns of a freshly read dataset in the smallest integer type that fits.
+
+    Parameters:
+    frame (DataFrame): The dataset.
+
+    Returns:
+    DataFrame: The same frame.
+    """
+    for column in NUMERIC_COLUMNS:
+        if column in frame.columns:
+            frame[column] = pd.to_numeric(frame[column], downcast="integer")
+    return frame
+
+
+def iter_dataset(columns=None, path=DATASET_PATH, chunksize=STREAM_CHUNK_SIZE):
+    """
+    Reads the Alivewatch dataset a chunk of rows at a time, so it never has to fit in memory.
+    Each chunk keeps its rows' positions in the whole dataset as its index.
+
+    Parameters:
+    columns (list): The columns to read. If None, reads all of them.
+    path (str): The location of the dataset.
+    chunksize (int): The number of rows in each chunk.
+
+    Yields:
+    DataFrame: The next chunk of the dataset.
+    """
+    with pd.read_csv(
+        path, chunksize=chunksize, **read_options(path, columns)
+    ) as chunks:
+        for chunk in chunks:
+            yield compact_types(chunk)
+
+
+def remember_dataset(frame, path=DATASET_PATH, complete=True):
+    """
+    Keeps a copy of the dataset in memory, matched to the current version of the file on disk.
+
+    Parameters:
+    frame (DataFrame): The dataset, as it is on disk.
+    path (str): The location of the dataset.
+    complete (bool): Whether the frame holds every column of the file.
+
+    Returns:
+    None
+    """
+    _dataset_cache[path] = (os.path.getmtime(path), frame, complete)
+
+
+def write_atomic(path, write):
+    """
+    Writes a file so that it is either completely written or not changed at all:
+    the contents go to a temporary file in the same directory, which then replaces the original.
+
+    Parameters:
+    path (str): The location of the file.
+    write (function): Called as write(temporary_path) to write the contents.
+
+    Returns:
+    None
+    """
+    directory = os.path.dirname(path) or "."
+    fd, temporary = tempfile.mkstemp(
+        dir=directory, prefix=".tmp-", suffix="-" + os.path.basename(path)
+    )
+    os.close(fd)
+    try:
+        write(temporary)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def file_sha256(path):
+    """
+    Returns the SHA-256 hash of a file's contents.
+
+    Parameters:
+    path (str): The location of the file.
+
+    Returns:
+    str: The hash, as a hex string.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_if_changed(path, content):
+    """
+    Writes a file, unless it already holds exactly this content - so unchanged outputs
+    don't show up as changes in git.
+
+    Parameters:
+    path (str): The location of the file.
+    content (bytes): The contents.
+
+    Returns:
+    bool: True if the file was written.
+    """
+    if (
+        os.path.exists(path)
+        and file_sha256(path) == hashlib.sha256(content).hexdigest()
+    ):
+        return False
+
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            f.write(content)
+
+    write_atomic(path, write)
+    return True
+
+
+def read_manifest(path=OLD_DATA_MANIFEST):
+    """
+    Returns the old data manifest: the days whose reports weren't saved because they were the same
+    as the last report saved.
+
+    Parameters:
+    path (str): The location of the manifest.
+
+    Returns:
+    dict: Maps the name each of those days' files would have had to the name of the file it is the same as.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_old_data(report, date, frame, directory=OLD_DATA_DIR):
+    """
+    Saves the dated copy of a report in old_data, unless it is the same as the last copy saved,
+    in which case a pointer to that copy goes in the manifest instead.
+
+    Parameters:
+    report (str): The name of the report, e.g. 'On_Alivewatch'.
+    date (str): The date of the report in the format YYYY-MM-DD.
+    frame (DataFrame): The report.
+    directory (str): The old data directory.
+
+    Returns:
+    bool: True if a new file was saved.
+    """
+    name = f"{date}-{report}.csv"
+    content = frame.to_csv(index=False).encode("utf-8")
+    manifest_path = os.path.join(directory, os.path.basename(OLD_DATA_MANIFEST))
+    manifest = read_manifest(manifest_path)
+
+    # Find the last copy saved before today
+    pattern = re.compile(r"(\d{4}-\d{2}-\d{2})-" + re.escape(report) + r"\.csv$")
+    earlier = sorted(
+        entry
+        for entry in os.listdir(directory)
+        if pattern.match(entry) and entry < name
+    )
+    same = (
+        bool(earlier)
+        and file_sha256(os.path.join(directory, earlier[-1]))
+        == hashlib.sha256(content).hexdigest()
+    )
+
+    if same:
+        manifest[name] = earlier[-1]
+        if os.path.exists(os.path.join(directory, name)):  # From an earlier run today
+            os.remove(os.path.join(directory, name))
+    else:
+        manifest.pop(name, None)
+        write_if_changed(os.path.join(directory, name), content)
+
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+
+    if manifest != read_manifest(manifest_path):
+        write_atomic(manifest_path, write)
+    return not same
+
+
+def load_profiles(path=PROFILES_PATH):
+    """
+    Reads the watchlist profiles. Each has a name, a minimum age (min_age), a notability rank range
+    (minrank to maxrank) and, optionally, a list of countries (areas, as in area1_of_rattachment).
+    The first profile is the main Alivewatch list, which can't be limited to some countries.
+
+    Parameters:
+    path (str): The location of the profiles file.
+
+    Returns:
+    list: The profiles, as dicts. Just DEFAULT_PROFILE if there is no profiles file.
+    """
+    if not os.path.exists(path):
+        return [dict(DEFAULT_PROFILE)]
+    with open(path) as f:
+        profiles = json.load(f)["profiles"]
+    for profile in profiles:
+        missing = {"name", "min_age", "minrank", "maxrank"} - set(profile)
+        if missing:
+            raise ValueError(
+                f"Profile {profile.get('name')} in {path} is missing {', '.join(sorted(missing))}"
+            )
+        if not re.fullmatch(r"\w+", profile["name"]):
+            raise ValueError(
+                f"Profile name {profile['name']} in {path} must be letters, digits and underscores"
+            )
+    if profiles and profiles[0].get("areas"):
+        raise ValueError(
+            f"The main profile ({profiles[0]['name']}) in {path} can't have areas - "
+            "add another profile for them"
+        )
+    return profiles
+
 
-    session = requests.Session()
-    session.headers.update(
-        {"User-Agent": "AliveWatchBot/1.0 (https://github.com/Viperiser/alivewatch/)"}
-    )
+def profile_mask(data, profile):
+    """
+    Picks out the living people who belong on a profile's list.
 
-    API_URL = "https://www.wikidata.org/w/api.php"
+    Parameters:
+    data (DataFrame): The watch table (or the main dataset).
+    profile (dict): The profile (see load_profiles).
 
-    # Step 1: Get login token
-    token_response = session.get(
-        API_URL,
-        params={"action": "query", "meta": "tokens", "type": "login", "format": "json"},
+    Returns:
+    Series: Which rows belong on the list.
+    """
+    maxyear = int(todays_date()[0:4]) - profile["min_age"]
+    mask = (
+        (data["deathstamp"] == " ")
+        & (data["birth"] <= maxyear)
+        & (data["ranking_visib_5criteria"] >= profile["minrank"])
+        & (data["ranking_visib_5criteria"] <= profile["maxrank"])
     )
+    if profile.get("areas"):
+        mask &= data["area1_of_rattachment"].isin(profile["areas"])
+    return mask
 
-    login_token = token_response.json()["query"]["tokens"]["logintoken"]
 
-    # Step 2: Log in using the bot password
-    login_response = session.post(
-        API_URL,
-        data={
-            "action": "login",
-            "lgname": WD_USERNAME,
-            "lgpassword": WD_PASSWORD,
-            "lgtoken": login_token,
-            "format": "json",
-        },
-    )
+def watch_table_info():
+    """
+    Returns the settings the watch table was built with, or None if there is no watch table.
 
-    result = login_response.json()
-    if result.get("login", {}).get("result") != "Success":
-        raise RuntimeError(f"Login failed: {result}")
+    Parameters:
+    None
 
-    return session
+    Returns:
+    dict: maxyear, minrank, maxrank, the other profiles and the hash of the main dataset it was built from.
+    """
+    if not os.path.exists(WATCH_TABLE_PATH) or not os.path.exists(
+        WATCH_TABLE_INFO_PATH
+    ):
+        return None
+    with open(WATCH_TABLE_INFO_PATH) as f:
+        return json.load(f)
 
 
-def clean_name(name):
+def save_watch_table(table, maxyear, minrank, maxrank, dataset_sha256, profiles=()):
     """
-    Cleans up the name of a person by removing underscores, leading/trailing quotes, and multiple spaces.
+    Writes the watch table and the settings it was built with.
 
     Parameters:
-    name (str): The name of the person to be cleaned.
+    table (DataFrame): The watch table.
+    maxyear (int): The maximum year of birth for people to be included in Alivewatch.
+    minrank (int): The minimum notability rank for people to be included in Alivewatch.
+    maxrank (int): The maximum notability rank for people to be included in Alivewatch.
+    dataset_sha256 (str): The hash of the main dataset the table matches.
+    profiles (list): The other watchlist profiles the table covers (see load_profiles).
 
     Returns:
-    str: The cleaned name.
+    None
     """
-    # Remove underscores and replace with spaces
-    name = name.replace("_", " ")
-    # Remove leading/trailing quotes
-    name = name.strip('"')
-    # Remove multiple spaces (if underscores were next to each other)
-    name = re.sub(r"\s+", " ", name).strip()
-    return name
+    write_atomic(
+        WATCH_TABLE_PATH,
+        lambda path: table.to_csv(path, index=False, encoding="utf-8"),
+    )
+    remember_dataset(table, WATCH_TABLE_PATH)
+    info = {
+        "maxyear": maxyear,
+        "minrank": minrank,
+        "maxrank": maxrank,
+        "profiles": list(profiles),
+        "dataset_sha256": dataset_sha256,
+    }
 
+    def write_info(path):
+        with open(path, "w") as f:
+            json.dump(info, f, indent=2)
 
-def render_movement(movement):
+    write_atomic(WATCH_TABLE_INFO_PATH, write_info)
+
+
+def add_tracking_columns(frame):
     """
-    Renders the movement of a person in a human-readable format.
+    Adds any of the TRACKING_COLUMNS that a dataset doesn't have yet, as empty text.
 
     Parameters:
-    movement (str): The movement of the person.
+    frame (DataFrame): The main dataset or the watch table.
 
     Returns:
-    str: The movement in a nice format.
+    DataFrame: The same frame, with the columns added.
     """
-    if movement == "new entry":
-        return "🆕"
-    elif int(movement) > 0:
-        return "▼" + str(int(movement))
-    elif int(movement) < 0:
-        return "▲" + str(abs(int(movement)))
-    else:
-        return "–"
+    for column in TRACKING_COLUMNS:
+        if column not in frame.columns:
+            frame[column] = ""
+    return frame
 
 
-# Date of death is property P570
-def deathdate(id, session):
+def merge_into_dataset(table, stream=False):
     """
-    Returns the date of death for a given Wikidata ID.
+    Copies the status of everyone in the watch table back into the main dataset, and saves it.
 
     Parameters:
-    id (str): The Wikidata ID of the person.
-    session (requests.Session): The authenticated session for making requests to Wikidata.
+    table (DataFrame): The watch table.
+    stream (bool): If True, rewrite the main dataset a chunk at a time (see iter_dataset).
 
     Returns:
-    str: The date of death in the format YYYY-MM-DD, or an empty string if no date is found.
+    str: The hash of the saved main dataset.
     """
-    uri = (
-        "https://www.wikidata.org/w/api.php?action=wbgetentities&props=claims&ids="
-        + id
-        + "&format=json"
+    if stream:
+        return merge_into_dataset_chunks(table)
+    data = add_tracking_columns(load_dataset())
+    rows = table["dataset_row"].to_numpy()
+    for column in STATUS_COLUMNS + TRACKING_COLUMNS:
+        data.loc[rows, column] = table[column].to_numpy()
+    print("Saving updated Alivewatch file")
+    write_atomic(
+        DATASET_PATH,
+        lambda path: data.to_csv(
+            path, index=False, compression="gzip", encoding="utf-8"
+        ),
     )
+    remember_dataset(data)
+    return file_sha256(DATASET_PATH)
 
-    time.sleep(1)
 
-    for attempt in range(5):  # Try up to 5 times
-        try:
-            r = session.get(uri, timeout=10)
-            if r.status_code == 429:
-                wait = 10 * (attempt + 1)
-                print(f"⚠️ Rate limited for {id}, waiting {wait} seconds...")
-                time.sleep(wait)
-                continue
-            elif r.status_code != 200:
-                print(f"⚠️ Bad response ({r.status_code}) for {id}")
-                return ""
+def merge_into_dataset_chunks(table):
+    """
+    Does what merge_into_dataset does, reading and writing the main dataset a chunk at a time.
 
-            r_json = json.loads(r.content.decode("utf-8"))
-            if "P570" in r_json["entities"][id]["claims"]:
-                dt = r_json["entities"][id]["claims"]["P570"][0]["mainsnak"][
-                    "datavalue"
-                ]["value"]["time"]
-                return dt[1:11]  # trim to YYYY-MM-DD
-            return ""
+    Parameters:
+    table (DataFrame): The watch table.
 
-        except json.JSONDecodeError:
-            print(f"❌ JSON decode error for {id}")
-            return ""
-        except Exception as e:
-            print(f"❌ General error for {id}: {e}")
-            return ""
+    Returns:
+    str: The hash of the saved main dataset.
+    """
+    table = table.set_index("dataset_row")
+    print("Saving updated Alivewatch file (streaming)")
 
-    print(f"❌ Failed to get data for {id} after 5 attempts.")
-    return ""
+    def write(path):
+        # pandas would compress each chunk separately - one gzip stream keeps the file as it was
+        with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+            for n, chunk in enumerate(iter_dataset()):
+                chunk = add_tracking_columns(chunk)
+                rows = table.index[table.index.isin(chunk.index)]
+                for column in STATUS_COLUMNS + TRACKING_COLUMNS:
+                    chunk.loc[rows, column] = table.loc[rows, column].to_numpy()
+                chunk.to_csv(f, header=n == 0, index=False)
 
+    write_atomic(DATASET_PATH, write)
+    return file_sha256(DATASET_PATH)
 
-def todays_date():
+
+def watch_mask(data, maxyear, minrank, maxrank, profiles=()):
     """
-    Returns today's date in the format YYYY-MM-DD.
+    Picks out the rows of the main dataset that belong in the watch table (see load_watch_table).
 
     Parameters:
-    None
+    data (DataFrame): The main dataset, or a chunk of it.
+    maxyear (int): The maximum year of birth for people to be included in Alivewatch.
+    minrank (int): The minimum notability rank for people to be included in Alivewatch.
+    maxrank (int): The maximum notability rank for people to be included in Alivewatch.
+    profiles (list): The other watchlist profiles (see load_profiles).
 
     Returns:
-    str: Today's date in the format YYYY-MM-DD.
+    Series: Which rows to keep.
     """
-    # Returns today's date in format YYYY-MM-DD
-    now = datetime.datetime.now()
-    year = str(now.year)
-    month = str(now.month)
-    if len(month) == 1:
-        month = "0" + month
-    day = str(now.day)
-    if len(day) == 1:
-        day = "0" + day
-    return year + "-" + month + "-" + day
+    in_range = (
+        (data["deathstamp"] == " ")
+        & (data["birth"] <= maxyear)
+        & (data["ranking_visib_5criteria"] >= minrank)
+        & (data["ranking_visib_5criteria"] <= maxrank)
+    )
+    for profile in profiles:
+        in_range |= profile_mask(data, profile)
+    return in_range | (data["alivewatch?"] == 1) | (data["deathstamp"] != " ")
 
 
-def compare_dates(date1, date2):
+def load_watch_table(maxyear, minrank, maxrank, profiles=(), stream=False):
     """
-    Compares two dates in the format YYYY-MM-DD. Returns True if date1 is later than date2.
+    Returns the watch table: the rows of the main dataset that the daily run works on.
+    These are the living people in the right age and notability range (or on any of the other
+    profiles' lists), everyone who has been on Alivewatch, and everyone recorded as dead.
+    The table is rebuilt from the main dataset if the settings have changed (e.g. a new year
+    brings in a new birth year) or if the main dataset has been changed by something else.
 
     Parameters:
-    date1 (str): The first date to compare.
-    date2 (str): The second date to compare.
+    maxyear (int): The maximum year of birth for people to be included in Alivewatch.
+    minrank (int): The minimum notability rank for people to be included in Alivewatch.
+    maxrank (int): The maximum notability rank for people to be included in Alivewatch.
+    profiles (list): The other watchlist profiles (see load_profiles).
+    stream (bool): If True, read (and rewrite) the main dataset a chunk at a time (see iter_dataset).
 
     Returns:
-    bool: True if date1 is later than date2, False otherwise. If date1 is blank, returns False. If date2 is blank, returns True.
+    DataFrame: The watch table, with a 'dataset_row' column giving each row's position in the main dataset.
+    """
+    info = watch_table_info()
+    dataset_sha256 = file_sha256(DATASET_PATH)
+    if info is not None and info["dataset_sha256"] == dataset_sha256:
+        table = add_tracking_columns(load_dataset(path=WATCH_TABLE_PATH))
+        settings = (info["maxyear"], info["minrank"], info["maxrank"])
+        if settings == (maxyear, minrank, maxrank) and info.get("profiles", []) == list(
+            profiles
+        ):
+            return table
+        # The settings have changed - keep what the old table knew before rebuilding it
+        dataset_sha256 = merge_into_dataset(table, stream)
+
+    print("Building the watch table from the main dataset")
+    chunks = iter_dataset() if stream else [load_dataset()]
+    parts = []
+    for data in chunks:
+        data = add_tracking_columns(data)
+        keep = watch_mask(data, maxyear, minrank, maxrank, profiles)
+        parts.append(data[keep].copy())
+    table = pd.concat(parts)
+    table.insert(0, "dataset_row", table.index)
+    table.reset_index(drop=True, inplace=True)
+    save_watch_table(table, maxyear, minrank, maxrank, dataset_sha256, profiles)
+    return table
+
+
+def imprecise_due(data, imprecise, budget=None):
+    """
+    Picks the people with an imprecise date of death who are due a recheck.
+    Each date is rechecked daily for IMPRECISE_DAILY_CHECKS checks, then weekly for
+    IMPRECISE_WEEKLY_CHECKS checks, then monthly. If more are due than the budget allows,
+    the most overdue are picked (starting with those never checked), and the rest wait for a later run.
+
+    Parameters:
+    data (DataFrame): The watch table.
+    imprecise (Series): Which rows have an imprecise date of death.
+    budget (int): The maximum number of requests to spend, each covering BATCH_SIZE people. None for no limit.
 
+    Returns:
+    Series: Which rows to recheck.
     """
-    if date1 == "":
-        return False
-    elif date2 == "":
-        return True
-    else:
-        year1 = int(date1[0:4])
-        year2 = int(date2[0:4])
-        if year1 > year2:
-            return True
-        elif year1 < year2:
-            return False
-        else:
-            month1 = int(date1[5:7])
-            month2 = int(date2[5:7])
-            if month1 > month2:
-                return True
-            elif month1 < month2:
-                return False
-            else:
-                day1 = int(date1[8:10])
-                day2 = int(date2[8:10])
-                if day1 > day2:
-                    return True
-                else:
-                    return False
+    checks = pd.to_numeric(data["imprecise_checks"], errors="coerce").fillna(0)
+    interval = pd.Series(30, index=data.index)
+    interval[checks < IMPRECISE_DAILY_CHECKS + IMPRECISE_WEEKLY_CHECKS] = 7
+    interval[checks < IMPRECISE_DAILY_CHECKS] = 1
+    checked = pd.to_datetime(
+        data["imprecise_checked"], format="%Y-%m-%d", errors="coerce"
+    )
+    overdue = (pd.Timestamp(todays_date()) - checked).dt.days - interval
+    overdue = overdue.fillna(float("inf"))  # Never checked
+    due = imprecise & (overdue >= 0)
+    if budget is not None and due.sum() > budget * BATCH_SIZE:
+        picked = overdue[due].sort_values(ascending=False, kind="stable")
+        due = data.index.to_series().isin(picked.index[: budget * BATCH_SIZE])
+    return due
 
 
-def find_death_position(data, id, death_date=None):
+def lookup_order(data, ids, maxyear, maxrank):
     """
-    Finds the position in Alivewatch at the time of death, for a given Wikidata ID.
-    Returns the position as a string or 'n/k' if not found.
+    Orders the lookups so that a run with a limited budget checks the people most likely to have died first.
+    Imprecise dates of death come first (they have their own budget - see imprecise_due), then the living
+    people by risk_factor, highest first - except that every ROTATION_EVERY-th batch goes to the people
+    checked longest ago, so everyone is checked in turn.
 
     Parameters:
-    data (DataFrame): The DataFrame containing Alivewatch data.
-    id (str): The Wikidata ID of the person.
-    death_date (str): The date of death in the format YYYY-MM-DD. If None, uses the death date from the DataFrame.
+    data (DataFrame): The watch table.
+    ids (list): The Wikidata IDs to look up.
+    maxyear (int): The maximum year of birth for people to be included in Alivewatch.
+    maxrank (int): The maximum notability rank for people to be included in Alivewatch.
 
     Returns:
-    str: The position at the time of death or 'n/k' if not found.
+    list: The same Wikidata IDs, in the order to look them up.
     """
-    # Get the death date for the given ID
-    if death_date is None:
-        death_date = data[data["wikidata_code"] == id]["deathstamp"].values[0]
-    addeddate = data[data["wikidata_code"] == id]["date_added_to_alivewatch"].values[0]
-
-    # If no death date is found, return empty string - they haven't died yet
-    if death_date == " ":
-        return ""
-
-    # If date of death is before 2024-01-03, return 'n/k' - this is when the ranking system was introduced
-    if compare_dates("2024-01-03", death_date):
-        return "n/k"
-
-    # Find name corresponding to the ID in Alivewatch
-    name = data[data["wikidata_code"] == id]["name"].values[0]
-    namecolumn = "name"
-    addedcolumn = "date_added_to_alivewatch"
-
-    # If date of death is before 2025-02-22, use raw name, otherwise use cleaned name
-    if compare_dates(death_date, "2025-02-21"):
-        name = clean_name(name)
-        namecolumn = "Name"
-        addedcolumn = "Date Added to Alivewatch"
-
-    # Look for the latest file of the form 'YYYY-MM-DD-On_Alivewatch.csv' before the death date
-    files = os.listdir("old_data")
-    files = [f for f in files if re.match(r"\d{4}-\d{2}-\d{2}-On_Alivewatch\.csv", f)]
-    files = sorted(files, reverse=True)  # Sort files in reverse order
-    # Remove files that are on or after the death date
-    files = [f for f in files if compare_dates(death_date, f[:10])]
-    # If no files are found, return 'n/k'
-    if not files:
-        return "n/k"
-    # Read the latest file
-    latest_file = files[0]
-    df = pd.read_csv(os.path.join("old_data", latest_file))
-
-    # If the date of the latest file is before 2024-01-05, convert the date format from a string YYYY-MM-DD to a string DD/MM/YYYY - this is when I changed the date format
-    if compare_dates("2024-01-05", latest_file[:10]):
-        day = latest_file[8:10]
-        month = latest_file[5:7]
-        year = latest_file[0:4]
-        addeddate = f"{day}/{month}/{year}"
-
-    # Check if the name is in the latest file
-    if name in df[namecolumn].values:
-        # Get the position of the name in the latest file - also use date added for disambiguation
-        position = (
-            df[(df[namecolumn] == name) & (df[addedcolumn] == addeddate)].index[0] + 1
-        )
-        return str(position)
-    else:  # Name not found
-        return "n/k"
+    # One row per person, or the loop below would wait for rows it can never take
+    people = data[data["wikidata_code"].isin(ids)].drop_duplicates("wikidata_code")
+    dead = people["deathstamp"] != " "
+    alive = people[~dead].assign(
+        age=int(todays_date()[0:4]) - people.loc[~dead, "birth"].astype(int)
+    )
+    by_risk = alive.loc[
+        risk_factor(alive, maxyear, maxrank)
+        .sort_values(ascending=False, kind="stable")
+        .index
+    ]
+    # Never checked ("") sorts before any date; ties go to the higher risk
+    by_rotation = by_risk.sort_values("last_checked", kind="stable")
+
+    order = list(people.loc[dead, "wikidata_code"])
+    taken = set(order)
+    by_risk_queue = iter(by_risk["wikidata_code"])
+    by_rotation_queue = iter(by_rotation["wikidata_code"])
+    batch = 0
+    while len(order) < len(people):
+        if batch % ROTATION_EVERY == ROTATION_EVERY - 1:
+            queue = by_rotation_queue
+        else:
+            queue = by_risk_queue
+        size = 0
+        for id in queue:
+            if id not in taken:
+                taken.add(id)
+                order.append(id)
+                size += 1
+                if size == BATCH_SIZE:
+                    break
+        batch += 1
+    return order
 
 
 # Update Alivewatch
-def update(maxyear, minrank, maxrank, session):
+def update(
+    maxyear,
+    minrank,
+    maxrank,
+    session,
+    incremental=False,
+    cache=None,
+    checkpoint=None,
+    sweep=False,
+    imprecise_budget=IMPRECISE_BUDGET,
+    prioritise=False,
+    max_requests=None,
+    time_budget=None,
+    profiles=(),
+    stream=False,
+):
     """
     Updates Alivewatch.csv with the latest death dates from Wikipedia.
+    Only the watch table (see load_watch_table) is read and rewritten; changes are copied
+    back into the main dataset only when someone's status has changed.
     Also updates the last updated date in last_updated.txt.
+    Records the Wikidata revision each person was last checked at, so that incremental runs
+    only fetch the claims of people whose Wikidata item has changed since.
 
     Parameters:
     maxyear (int): The maximum year of birth for people to be included in Alivewatch.
     minrank (int): The minimum notability rank for people to be included in Alivewatch.
     maxrank (int): The maximum notability rank for people to be included in Alivewatch.
     session (requests.Session): The authenticated session for making requests to Wikidata.
+    incremental (bool): If True, only fetch claims for people whose Wikidata item has a new revision.
+    cache (EntityCache): The entity cache. If None, everything is fetched from Wikidata.
+    checkpoint (Checkpoint): The journal of lookups. People it already has results for are not looked up again.
+    sweep (bool): If True, first ask the Wikidata Query Service which living people now have a date of death,
+        and only look those people up in detail.
+    imprecise_budget (int): The most requests to spend rechecking imprecise dates of death (see imprecise_due).
+        None for no limit.
+    prioritise (bool): If True, look people up in order of risk (see lookup_order).
+    max_requests (int): The most requests to spend looking people up - sweep queries, revision checks
+        and wbgetentities requests alike (see RequestBudget). Implies prioritise. None for no limit.
+    time_budget (float): Seconds after which to stop looking people up. Implies prioritise. None for no limit.
+        People who aren't looked up keep their status.
+    profiles (list): The other watchlist profiles (see load_profiles). Their people are looked up in the same pass,
+        once each however many lists they are on; only the main list's people are added to Alivewatch.
+    stream (bool): If True, read and rewrite the main dataset a chunk at a time (see iter_dataset),
+        so memory use doesn't grow with its size.
 
     Returns:
     None
     """
 
-    data = pd.read_csv(
-        "Alivewatch.csv.gz", na_filter=False, compression="gzip", encoding="utf-8"
+    started = time.monotonic()
+    data = load_watch_table(maxyear, minrank, maxrank, profiles, stream)
+    METRICS.count("rows_scanned", len(data))
+
+    # Look up everyone who needs a death date check in one batched pass:
+    # people with an imprecise date of death who are due a recheck, and living people in the right age and notability range
+    alive = data["deathstamp"] == " "
+    imprecise = ~alive & (data["deathstamp"].str[8:10] == "00")
+    recheck = imprecise_due(data, imprecise, imprecise_budget)
+    in_range = (
+        alive
+        & (data["birth"] <= maxyear)
+        & (data["ranking_visib_5criteria"] >= minrank)
+        & (data["ranking_visib_5criteria"] <= maxrank)
     )
+    # People on the other profiles' lists are checked in the same pass
+    on_profiles = in_range.copy()
+    for profile in profiles:
+        on_profiles |= profile_mask(data, profile)
+    print(
+        f"Rechecking {int(recheck.sum())} of {int(imprecise.sum())} imprecise dates of death"
+    )
+    lookup_ids = list(data.loc[recheck | on_profiles, "wikidata_code"])
+    dates = {id: "" for id in lookup_ids}  # Anyone not looked up keeps their status
+    checked = set()  # People whose status was confirmed, one way or another
+    revids = {}
+    revisions = {}
+
+    # With a budget, check the people most likely to have died first, in every pass,
+    # so a limited run spends its requests where they matter
+    budget = None
+    if max_requests is not None or time_budget is not None:
+        deadline = None if time_budget is None else started + time_budget
+        budget = RequestBudget(max_requests, deadline)
+    if prioritise or budget is not None:
+        lookup_ids = lookup_order(data, lookup_ids, maxyear, maxrank)
+
+    # Skip people already looked up earlier in this run, before it was interrupted
+    if checkpoint is not None:
+        for id in lookup_ids:
+            if id in checkpoint.resolved:
+                dates[id], revids[id] = checkpoint.resolved[id]
+                checked.add(id)
+        lookup_ids = [id for id in lookup_ids if id not in checkpoint.resolved]
+
+    # Sweep the living people for deaths in a few queries, and only look up the ones who have one
+    # (plus anyone with an imprecise date, which a sweep can't check). If part of the sweep fails,
+    # the people it covered are looked up in detail as usual
+    if sweep:
+        profile_ids = set(data.loc[on_profiles, "wikidata_code"])
+        alive_ids = [id for id in lookup_ids if id in profile_ids]
+        print(f"Sweeping {len(alive_ids)} people for new deaths")
+        with METRICS.phase("sweep"):
+            swept = dict(
+                fetch_batches(
+                    get_sparql_deaths,
+                    alive_ids,
+                    session,
+                    workers=1,
+                    batch_size=SPARQL_BATCH_SIZE,
+                    budget=budget,
+                )
+            )
+        hits = sum(hit is True for hit in swept.values())
+        unswept = len(alive_ids) - sum(hit is not None for hit in swept.values())
+        print(f"{hits} now have a date of death ({unswept} could not be swept)")
+        checked.update(id for id, hit in swept.items() if hit is False)
+        lookup_ids = [id for id in lookup_ids if swept.get(id) is not False]
+
+    # Skip people whose Wikidata item hasn't changed since we last checked
+    if incremental:
+        print(f"Checking {len(lookup_ids)} Wikidata revisions")
+        known = dict(zip(data["wikidata_code"], data["lastrevid"]))
+        with METRICS.phase("revisions"):
+            info_batch_size = (
+                session.info_batch_size()
+                if isinstance(session, BotSession)
+                else INFO_BATCH_SIZE
+            )
+            revisions = dict(
+                fetch_batches(
+                    get_revisions,
+                    lookup_ids,
+                    session,
+                    batch_size=info_batch_size,
+                    budget=budget,
+                )
+            )
+        unchanged = {
+            id
+            for id in lookup_ids
+            if revisions.get(id) is not None and revisions[id] == known[id]
+        }
+        checked.update(unchanged)
+        lookup_ids = [id for id in lookup_ids if id not in unchanged]
+
+    print(f"Looking up {len(lookup_ids)} death dates on Wikidata")
+    looked_up = 0
+    with METRICS.phase("deathdate"), contextlib.closing(
+        iter_entities(lookup_ids, session, cache, revisions, budget=budget)
+    ) as entities:
+        for id, entity in entities:
+            dates[id] = parse_deathdate(entity)
+            if entity is not None:
+                revids[id] = str(entity.get("lastrevid", ""))
+                checked.add(id)
+                if checkpoint is not None:
+                    checkpoint.record(id, dates[id], revids[id])
+            looked_up += 1
+            if looked_up % (10 * BATCH_SIZE) == 0:
+                print(f"Looked up {looked_up}/{len(lookup_ids)}")
+    if budget is not None and budget.stopped:
+        print(
+            f"⚠️ {budget.stopped} - stopped after {budget.used} requests, "
+            f"with {len(lookup_ids) - looked_up} of {len(lookup_ids)} people not looked up"
+        )
+    if cache is not None:
+        print(f"{cache.hits} of {len(lookup_ids)} entities came from the cache")
+
+    # Work out what happened to everyone, a whole column at a time
+    # Death date found, if any (as str even when the watch table is empty)
+    found = data["wikidata_code"].map(dates).fillna("").astype(str)
+    on_watch = data["alivewatch?"] == 1
+    # Precise date now known (or at least a different date)
+    date_updated = recheck & (found != "") & (found != data["deathstamp"])
+    needs_position = on_watch & ~alive & (data["position_at_death"] == "")
+    # Only people actually checked count as alive - anyone cut off by the budget keeps their status
+    in_range_checked = in_range & data["wikidata_code"].isin(checked)
+    still_alive = in_range_checked & (found == "")
+    added = still_alive & ~on_watch
+    died = in_range & (found != "")
+    missed = died & ~on_watch
+    died_elsewhere = on_profiles & ~in_range & (found != "")  # Only on the other lists
+
     newdata = data.copy()
-    num = len(data)
-    deathstampnew = data["deathstamp"].copy()  # Use existing date unless updated below
-    alivewatchnew = data[
-        "alivewatch?"
-    ].copy()  # Use existing value unless updated below
-    dateaddednew = data[
-        "date_added_to_alivewatch"
-    ].copy()  # Use existing date unless updated below
-    deathpositionnew = data[
-        "position_at_death"
-    ].copy()  # Use existing value unless updated below
-
-    for i in range(num):
-        # check if died
-        if data["deathstamp"][i] != " ":  # They are already recorded as dead
-            fate = "Already dead"
-            # Find the day of the month recorded in their death date
-            deathday = int(data["deathstamp"][i][8:10])
-            if (
-                deathday == 0
-            ):  # This means that the precise date was previously unknown, so update it
-                ded = deathdate(data["wikidata_code"][i], session)
-                if ded != "":
-                    deathstampnew[i] = ded
-                    fate = "Died - date updated to " + ded
-
-            if (
-                data["alivewatch?"][i] == 1
-                and data["deathstamp"][i] != " "
-                and data["position_at_death"][i] == ""
-            ):  # Need to add their position at time of death
-                death_position = find_death_position(data, data["wikidata_code"][i])
-                deathpositionnew[i] = death_position
-                fate = "Already dead - position at death updated to " + death_position
-
-        else:  # They are still alive
-            if (
-                data["birth"][i] > maxyear
-            ):  # They are too young to be on Alivewatch, so no further action required
-                continue
-            else:
-                if (
-                    data["ranking_visib_5criteria"][i] < minrank
-                ):  # They are too famous to be on Alivewatch, so no further action required
-                    continue
-                else:
-                    if (
-                        data["ranking_visib_5criteria"][i] > maxrank
-                    ):  # They are too obscure to be on Alivewatch, so no further action required
-                        continue
-                    else:  # They are in the right age range and notability range to be on Alivewatch, and still alive
-                        ded = deathdate(
-                            data["wikidata_code"][i], session
-                        )  # Find their death date from Wikipedia
-                        if ded == "":  # No death date found, so they are still alive
-                            fate = "Still alive - already on Alivewatch"  # Default fate, unless...
-                            alivewatchnew[i] = 1
-                            if (
-                                data["alivewatch?"][i] == 0
-                            ):  # Oops! They are not already on Alivewatch, so...
-                                dateaddednew[i] = todays_date()
-                                fate = "Still alive - added to Alivewatch"  # ...they are now!
-                        else:  # They do have a deathdate, so they have died
-                            fate = "Died under watch:" + ded
-                            deathstampnew[i] = ded
-                            deathpositionnew[i] = find_death_position(
-                                data, data["wikidata_code"][i], ded
-                            )
-                            if data["alivewatch?"][i] == 0:
-                                fate = "Died - missed by Alivewatch"
-        if fate != "":
-            print("Processed ", str(i) + "/" + str(num), data["name"][i], fate)
-    newdata["deathstamp"] = deathstampnew
-    newdata["alivewatch?"] = alivewatchnew
-    newdata["date_added_to_alivewatch"] = dateaddednew
-    newdata["position_at_death"] = deathpositionnew
-    print("Saving updated Alivewatch file")
-    newdata.to_csv(
-        "Alivewatch.csv.gz", index=False, compression="gzip", encoding="utf-8"
+    changed = date_updated | died | died_elsewhere
+    newdata.loc[changed, "deathstamp"] = found[changed]
+    newdata.loc[still_alive, "alivewatch?"] = 1
+    newdata.loc[added, "date_added_to_alivewatch"] = todays_date()
+    newdata["lastrevid"] = data["wikidata_code"].map(revids).fillna(data["lastrevid"])
+
+    # Record each recheck of an imprecise date, and forget the record once the date is precise
+    rechecked = recheck & data["wikidata_code"].isin(checked)
+    checks = pd.to_numeric(data["imprecise_checks"], errors="coerce").fillna(0)
+    newdata.loc[rechecked, "imprecise_checks"] = (
+        (checks[rechecked] + 1).astype(int).astype(str)
+    )
+    newdata.loc[rechecked, "imprecise_checked"] = todays_date()
+    precise = date_updated & (found.str[8:10] != "00")
+    newdata.loc[precise, ["imprecise_checks", "imprecise_checked"]] = ""
+
+    # Record who was checked, so that prioritised runs can check everyone else in turn
+    confirmed = on_profiles & data["wikidata_code"].isin(checked)
+    newdata.loc[confirmed, "last_checked"] = todays_date()
+
+    # Positions at death need a look through the old lists - but only for the handful of people who need one
+    positions = death_positions(data, data.index[needs_position])
+    newdata.loc[positions.index, "position_at_death"] = positions
+    positions = death_positions(data, data.index[died], found[died])
+    newdata.loc[positions.index, "position_at_death"] = positions
+
+    # Report what changed
+    for i in data.index[date_updated]:
+        print(data.at[i, "name"], "Died - date updated to " + found[i])
+    for i in data.index[needs_position]:
+        print(
+            data.at[i, "name"],
+            "Already dead - position at death updated to "
+            + newdata.at[i, "position_at_death"],
+        )
+    for i in data.index[died]:
+        fate = "Died - missed by Alivewatch:" if missed[i] else "Died under watch:"
+        print(data.at[i, "name"], fate + found[i])
+    for i in data.index[died_elsewhere]:
+        print(
+            data.at[i, "name"],
+            "Died (not on Alivewatch, but on another list):" + found[i],
+        )
+    for i in data.index[added]:
+        print(data.at[i, "name"], "Still alive - added to Alivewatch")
+    print(
+        f"Checked {int(in_range_checked.sum())} of {int(in_range.sum())} people in range: "
+        f"{int(still_alive.sum())} still alive "
+        f"({int(added.sum())} added), {int(died.sum())} died ({int(missed.sum())} missed)"
     )
 
+    # Only rewrite the main dataset if someone's status has changed
+    dataset_sha256 = watch_table_info()["dataset_sha256"]
+    if not newdata[STATUS_COLUMNS].equals(data[STATUS_COLUMNS]):
+        dataset_sha256 = merge_into_dataset(newdata, stream)
+    save_watch_table(newdata, maxyear, minrank, maxrank, dataset_sha256, profiles)
+
     # Update the last updated date in last_updated.txt
     now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     with open("data/last_updated.txt", "w") as f:
         f.write(now)
 
 
-def report(maxyear, maxrank):
+def backfill_positions(
+    maxyear,
+    minrank,
+    maxrank,
+    profiles=(),
+    recompute=False,
+    workers=POSITION_WORKERS,
+    stream=False,
+):
+    """
+    Fills in the position at death of everyone who died on Alivewatch and doesn't have one yet,
+    all at once (see death_positions) - e.g. after the dataset has been re-imported.
+
+    Parameters:
+    maxyear (int): The maximum year of birth for people to be included in Alivewatch.
+    minrank (int): The minimum notability rank for people to be included in Alivewatch.
+    maxrank (int): The maximum notability rank for people to be included in Alivewatch.
+    profiles (list): The other watchlist profiles (see load_profiles).
+    recompute (bool): If True, work out everyone's position at death again, not just the missing ones.
+    workers (int): The most processes to use.
+    stream (bool): If True, read and rewrite the main dataset a chunk at a time (see iter_dataset).
+
+    Returns:
+    int: The number of positions changed.
+    """
+    started = time.monotonic()
+    data = load_watch_table(maxyear, minrank, maxrank, profiles, stream)
+    pending = (data["alivewatch?"] == 1) & (data["deathstamp"] != " ")
+    if not recompute:
+        pending &= data["position_at_death"] == ""
+    positions = death_positions(data, data.index[pending], workers=workers)
+
+    newdata = data.copy()
+    newdata.loc[positions.index, "position_at_death"] = positions
+    changed = int((positions != data.loc[positions.index, "position_at_death"]).sum())
+    print(
+        f"Found {len(positions)} positions at death in {time.monotonic() - started:.1f}s "
+        f"({changed} changed)"
+    )
+
+    dataset_sha256 = watch_table_info()["dataset_sha256"]
+    if changed:
+        dataset_sha256 = merge_into_dataset(newdata, stream)
+    save_watch_table(newdata, maxyear, minrank, maxrank, dataset_sha256, profiles)
+    return changed
+
+
+def profile_list(people, profile, risk):
+    """
+    Makes a profile's list: its people ranked by risk, like the main list.
+
+    Parameters:
+    people (DataFrame): The people on the list, with the columns report() reads.
+    profile (dict): The profile (see load_profiles).
+    risk (function): Scores the people, as risk(alive, maxyear, maxrank) - see risk_factor.
+
+    Returns:
+    DataFrame: The list.
+    """
+    thisyear = int(todays_date()[0:4])
+    people = pd.DataFrame(
+        {
+            "name": clean_names(people["name"]),
+            "profession": people["level3_main_occ"]
+            .astype(str)
+            .str.replace("_", " ")
+            .str.title(),
+            "age": thisyear - people["birth"].astype(int),
+            "ranking_visib_5criteria": people["ranking_visib_5criteria"],
+        }
+    )
+    people["risk_factor"] = risk(
+        people, thisyear - profile["min_age"], profile["maxrank"]
+    )
+    people = people.sort_values(by=["risk_factor"], ascending=False)
+    people.insert(0, "priority", range(1, len(people) + 1))
+    return people.drop(columns=["risk_factor", "ranking_visib_5criteria"]).rename(
+        columns={
+            "priority": "Priority Rank",
+            "name": "Name",
+            "profession": "Profession",
+            "age": "Approximate Age",
+        }
+    )
+
+
+def report(
+    maxyear, maxrank, risk=None, movement_periods=(365,), minrank=None, profiles=()
+):
     """
     Produces a set of csv files from Alivewatch.csv, including:
     - all the people who are still alive, on alivewatch, ranked by risk factor
@@ -394,119 +2490,80 @@ def report(maxyear, maxrank):
     Parameters:
     maxyear (int): The maximum year of birth for people to be included in Alivewatch.
     maxrank (int): The maximum notability rank for people to be included in Alivewatch.
+    risk (function): Scores the people on Alivewatch, as risk(alive, maxyear, maxrank) - see risk_factor.
+        Uses risk_factor if None.
+    movement_periods (tuple): The periods, in days, over which to show each person's change in position.
+    minrank (int): The minimum notability rank for people to be included in Alivewatch. If given, people
+        outside the main list's range (who can only have been found dead through another list) aren't
+        counted as missed by Alivewatch.
+    profiles (list): The other watchlist profiles (see load_profiles), whose lists are written to PROFILES_DIR.
 
     Returns:
     None
     """
+    if risk is None:
+        risk = risk_factor
 
-    # Read in data
-    data = pd.read_csv(
-        "Alivewatch.csv.gz",
-        na_filter=False,
-        compression="gzip",
-        encoding="utf-8",
-        dtype={"date_added_to_alivewatch": "object"},
-        low_memory=False,
-    )
-    num = len(data)
+    # Read in data - the watch table holds everyone the reports cover
+    if os.path.exists(WATCH_TABLE_PATH):
+        data = load_dataset(REPORT_COLUMNS, path=WATCH_TABLE_PATH)
+    else:
+        data = load_dataset(REPORT_COLUMNS)
+    METRICS.count("rows_scanned", len(data))
+
+    # The other profiles' lists come from the same read of the data
+    for profile in profiles:
+        people = data[profile_mask(data, profile)]
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        write_if_changed(
+            os.path.join(PROFILES_DIR, profile["name"] + ".csv"),
+            profile_list(people, profile, risk).to_csv(index=False).encode("utf-8"),
+        )
+
+    # Pick out the three groups of people with masks over the whole dataset
+    alive_mask = (data["deathstamp"] == " ") & (data["alivewatch?"] == 1)
+    died_mask = (data["deathstamp"] != " ") & (data["alivewatch?"] == 0)
+    if minrank is not None:
+        died_mask &= (
+            (data["birth"] <= maxyear)
+            & (data["ranking_visib_5criteria"] >= minrank)
+            & (data["ranking_visib_5criteria"] <= maxrank)
+        )
+    diedsince_mask = (data["deathstamp"] != " ") & (data["alivewatch?"] == 1)
+    data = data[alive_mask | died_mask | diedsince_mask].copy()
 
-    # Clean up values
-    data["name"] = data["name"].apply(clean_name)
-    data["level3_main_occ"] = data["level3_main_occ"].str.replace("_", " ").str.title()
+    # Clean up values - only for the rows we report on
+    data["name"] = clean_names(data["name"])
+    data["profession"] = data["level3_main_occ"].str.replace("_", " ").str.title()
+    data["age"] = int(todays_date()[0:4]) - data["birth"].astype(int)
 
-    # Create new dataframes
-    alive = pd.DataFrame(
-        columns=[
+    alive = data.loc[
+        alive_mask,
+        [
             "name",
             "profession",
             "age",
             "ranking_visib_5criteria",
             "date_added_to_alivewatch",
-            "risk_factor",
-        ]
-    )
-    died = pd.DataFrame(columns=["name", "profession", "birth", "deathstamp"])
-    diedsince = pd.DataFrame(
-        columns=[
+        ],
+    ].reset_index(drop=True)
+    died = data.loc[
+        died_mask, ["name", "profession", "birth", "deathstamp"]
+    ].reset_index(drop=True)
+    diedsince = data.loc[
+        diedsince_mask,
+        [
             "name",
             "profession",
             "birth",
             "deathstamp",
             "date_added_to_alivewatch",
-        ]
-    )
-    added = pd.DataFrame(
-        columns=[
-            "name",
-            "profession",
-            "birth",
-            "ranking_visib_5criteria",
-            "date_added_to_alivewatch",
-        ]
-    )
-
-    # Populate new dataframes
-    alive_list = []
-    died_list = []
-    diedsince_list = []
-
-    # Populate lists
-    for i in range(num):
-        if (
-            data["deathstamp"][i] == " " and data["alivewatch?"][i] == 1
-        ):  # Still alive and on Alivewatch
-            alive_list.append(
-                {
-                    "name": data["name"][i],
-                    "profession": data["level3_main_occ"][i],
-                    "age": int(todays_date()[0:4]) - data["birth"][i],
-                    "ranking_visib_5criteria": data["ranking_visib_5criteria"][i],
-                    "date_added_to_alivewatch": data["date_added_to_alivewatch"][i],
-                }
-            )
-
-        if (
-            data["deathstamp"][i] != " " and data["alivewatch?"][i] == 0
-        ):  # Dead, but not on Alivewatch
-            died_list.append(
-                {
-                    "name": data["name"][i],
-                    "profession": data["level3_main_occ"][i],
-                    "birth": data["birth"][i],
-                    "deathstamp": data["deathstamp"][i],
-                }
-            )
-
-        if (
-            data["deathstamp"][i] != " " and data["alivewatch?"][i] == 1
-        ):  # Died under Alivewatch
-            diedsince_list.append(
-                {
-                    "name": data["name"][i],
-                    "profession": data["level3_main_occ"][i],
-                    "birth": data["birth"][i],
-                    "deathstamp": data["deathstamp"][i],
-                    "date_added_to_alivewatch": data["date_added_to_alivewatch"][i],
-                    "position_at_death": data["position_at_death"][i],
-                }
-            )
-
-    # Convert lists to DataFrames
-    alive = pd.DataFrame(alive_list)
-    died = pd.DataFrame(died_list)
-    diedsince = pd.DataFrame(diedsince_list)
+            "position_at_death",
+        ],
+    ].reset_index(drop=True)
 
     # Add risk factor to Alivewatch
-    riskfactors = []
-    for i in range(len(alive)):
-        nextfactor = (
-            6600 * alive["age"][i]
-            - alive["ranking_visib_5criteria"][i]
-            - 6600 * (int(todays_date()[0:4]) - maxyear)
-            + maxrank
-        ) / 200000
-        riskfactors.append(nextfactor)
-    alive["risk_factor"] = riskfactors
+    alive["risk_factor"] = risk(alive, maxyear, maxrank)
 
     # Sort dataframes
     alive = alive.sort_values(
@@ -528,61 +2585,12 @@ def report(maxyear, maxrank):
     diedsince = diedsince.drop(columns=["date_added_to_alivewatch"])
     added = added.drop(columns=["ranking_visib_5criteria", "risk_factor"])
 
-    # Now find each person's position this time last year
-    # Find the date one year ago
+    # Now find how each person's position has changed over each period, e.g. since this time last year
     alive.reset_index(
         drop=True, inplace=True
     )  # Reset index to avoid issues with indexing
-    movement_in_last_year = []
-    lastyear = datetime.datetime.now() - datetime.timedelta(days=365)
-    lastyear = lastyear.strftime("%Y-%m-%d")
-    # Find the latest file of the form 'YYYY-MM-DD-On_Alivewatch.csv' before lastyear
-    files = os.listdir("old_data")
-    files = [f for f in files if re.match(r"\d{4}-\d{2}-\d{2}-On_Alivewatch\.csv", f)]
-    # Remove files that are later than lastyear
-    files = [f for f in files if not compare_dates(f[:10], lastyear)]
-    # Find the most recent file
-    files = sorted(files, reverse=True)  # Sort files in reverse order
-    file = files[0]  # Get the most recent file
-    # Read the file
-    alivewatch_last_year = pd.read_csv(os.path.join("old_data", file))
-
-    # Find the correct name of the 'name' column, which changed in Feb 2025
-    if "Name" in alivewatch_last_year.columns:
-        namefield = "Name"
-    else:
-        namefield = "name"
-
-    # Find the correct name of the date column
-    namefield = "Name" if "Name" in alivewatch_last_year.columns else "name"
-    datefield = (
-        "Date Added to Alivewatch"
-        if "Date Added to Alivewatch" in alivewatch_last_year.columns
-        else "date_added_to_alivewatch"
-    )
-    # Now match each of the names in alive to the names in alivewatch_last_year, along with date added (for disambiguation)
-    for i in range(len(alive)):
-        # Check if the name is in the last year's file
-        if alive["name"][i] in alivewatch_last_year[namefield].values:
-            # Get the position of the name in last year's file - also use date added for disambiguation
-            position = (
-                alivewatch_last_year[
-                    (alivewatch_last_year[namefield] == alive["name"][i])
-                    & (
-                        alivewatch_last_year[datefield]
-                        == alive["date_added_to_alivewatch"][i]
-                    )
-                ].index[0]
-                + 1
-            )
-            movement_in_last_year.append(
-                render_movement(str(int(alive["priority"][i]) - int(position)))
-            )
-        else:  # Name not found
-            movement_in_last_year.append(render_movement("new entry"))
-
-    # Add the positions to the dataframe
-    alive.insert(5, "movement_in_last_year", movement_in_last_year)
+    for n, days in enumerate(movement_periods):
+        alive.insert(5 + n, movement_column(days), movement_since(alive, days))
 
     # Rename columns
     alive = alive.rename(
@@ -592,7 +2600,6 @@ def report(maxyear, maxrank):
             "profession": "Profession",
             "age": "Approximate Age",
             "date_added_to_alivewatch": "Date Added to Alivewatch",
-            "movement_in_last_year": "Change Since Last Year",
         }
     )
     diedsince = diedsince.rename(
@@ -623,67 +2630,214 @@ def report(maxyear, maxrank):
     )
 
     # Find the date of the latest death in the diedsince dataframe - this will be the first row because it's sorted by date of death
-    latest_death_date = diedsince["Date of Death"].values[0]
-    # Find how many days ago this was
-    latest_death_date = datetime.datetime.strptime(latest_death_date, "%Y-%m-%d")
-    days_ago = (datetime.datetime.now() - latest_death_date).days
-    # Save it to a text file called 'days_since_last_death.txt'
-    with open("data/days_since_last_death.txt", "w") as f:
-        f.write(str(days_ago))
-
-    # Write the date-named versions of the dataframes to csv in old_data
+    # (a fresh dataset, such as the benchmark's, may have no deaths yet)
+    if len(diedsince):
+        latest_death_date = diedsince["Date of Death"].values[0]
+        # Find how many days ago this was
+        latest_death_date = datetime.datetime.strptime(latest_death_date, "%Y-%m-%d")
+        days_ago = (datetime.datetime.now() - latest_death_date).days
+        # Save it to a text file called 'days_since_last_death.txt'
+        with open("data/days_since_last_death.txt", "w") as f:
+            f.write(str(days_ago))
+
+    reports = [
+        ("On_Alivewatch", alive),
+        ("Missed_by_alivewatch", died),
+        ("Died_under_watch", diedsince),
+        ("Alivewatch_by_date_added", added),
+    ]
+
+    # Write the date-named versions of the dataframes to csv in old_data - unless they haven't changed
     print("Saving copies to the old data directory")
-    filepath = "old_data/"
-    alive.to_csv(
-        filepath + todays_date() + "-On_Alivewatch.csv", index=False, encoding="utf-8"
+    saved = [save_old_data(name, todays_date(), frame) for name, frame in reports]
+    print(f"{sum(saved)} of {len(saved)} reports have changed since the last copies")
+
+    # Add them to the history
+    for name, frame in reports:
+        history.append_snapshot(name, todays_date(), frame)
+
+    # Write the non-dated versions to the data directory, leaving any that haven't changed alone
+    print("Saving the latest versions to the data directory")
+    for name, frame in reports:
+        write_if_changed(f"data/{name}.csv", frame.to_csv(index=False).encode("utf-8"))
+
+    # And the precomputed pages that index.html and died.html read
+    pages.publish("On_Alivewatch", alive)
+    pages.publish("Died_under_watch", diedsince)
+
+
+def parse_args(argv=None):
+    """
+    Parses the command line options.
+
+    Parameters:
+    argv (list): The command line arguments. If None, uses sys.argv.
+
+    Returns:
+    argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(
+        description="Update Alivewatch from Wikidata and produce the reports."
     )
-    died.to_csv(
-        filepath + todays_date() + "-Missed_by_alivewatch.csv",
-        index=False,
-        encoding="utf-8",
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only fetch claims for people whose Wikidata item has changed since the last run",
     )
-    diedsince.to_csv(
-        filepath + todays_date() + "-Died_under_watch.csv",
-        index=False,
-        encoding="utf-8",
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="bypass the local Wikidata entity cache",
     )
-    added.to_csv(
-        filepath + todays_date() + "-Alivewatch_by_date_added.csv",
-        index=False,
-        encoding="utf-8",
+    parser.add_argument(
+        "--refresh-cache",
+        action="store_true",
+        help="fetch everything from Wikidata again, replacing what is in the cache",
     )
-
-    # Write the non-dated versions to the data directory
-    print("Saving the latest versions to the data directory")
-    alive.to_csv("data/On_Alivewatch.csv", index=False, encoding="utf-8")
-    died.to_csv("data/Missed_by_alivewatch.csv", index=False, encoding="utf-8")
-    diedsince.to_csv("data/Died_under_watch.csv", index=False, encoding="utf-8")
-    added.to_csv("data/Alivewatch_by_date_added.csv", index=False, encoding="utf-8")
+    parser.add_argument(
+        "--cache-info",
+        action="store_true",
+        help="print a summary of the local Wikidata entity cache and exit",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip people already looked up by an earlier, interrupted run today",
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="find new deaths with a few Wikidata Query Service queries, and only look those people up in detail",
+    )
+    parser.add_argument(
+        "--imprecise-budget",
+        type=int,
+        default=IMPRECISE_BUDGET,
+        help=f"most requests per run for rechecking imprecise dates of death (default: {IMPRECISE_BUDGET})",
+    )
+    parser.add_argument(
+        "--prioritise",
+        action="store_true",
+        help="look people up in order of risk, highest first, with some of each run spent on whoever was checked longest ago",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        help="most wbgetentities requests per run (implies --prioritise)",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        help="seconds after which to stop looking people up (implies --prioritise)",
+    )
+    parser.add_argument(
+        "--backfill-positions",
+        nargs="?",
+        const="missing",
+        choices=["missing", "all"],
+        help="fill in the missing positions at death (or, with 'all', work them all out again) and exit",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="read and rewrite the main dataset in chunks, so it never has to fit in memory",
+    )
+    parser.add_argument(
+        "--movement-periods",
+        default="365",
+        help="comma-separated periods, in days, over which to show changes in position (default: 365)",
+    )
+    return parser.parse_args(argv)
 
 
-def main():
+def main(argv=None):
     """
     Main function to run the update and report functions. Updates the Alivewatch.csv file and generates reports.
 
     Parameters:
-    None
+    argv (list): The command line arguments. If None, uses sys.argv.
 
     Returns:
     None
     """
-    # Log into Wikidata
-    session = get_authenticated_session()
-
-    # Set parameters
-    maxyear = datetime.datetime.now().year - 85
-    minrank = 1000  # minimum notability rank (excludes people who are too famous)
-    maxrank = 100000  # maximum notability rank (excludes people who are too obscure)
-
-    # Update Alivewatch from wikipedia
-    update(maxyear, minrank, maxrank, session)
-
-    # Create reports
-    report(maxyear, maxrank)
+    args = parse_args(argv)
+
+    if args.cache_info:
+        cache_info()
+        return
+
+    # Set parameters - the main list is the first profile, see load_profiles
+    main_profile, *profiles = load_profiles()
+    maxyear = datetime.datetime.now().year - main_profile["min_age"]
+    minrank = main_profile["minrank"]
+    maxrank = main_profile["maxrank"]
+    movement_periods = tuple(int(days) for days in args.movement_periods.split(","))
+
+    # Positions at death only need the old lists, not Wikidata
+    if args.backfill_positions:
+        backfill_positions(
+            maxyear,
+            minrank,
+            maxrank,
+            profiles,
+            recompute=args.backfill_positions == "all",
+            stream=args.stream,
+        )
+        return
+
+    # Record how long each part of the run takes, even if it fails
+    METRICS.start()
+    completed = False
+    try:
+        # Log into Wikidata
+        with METRICS.phase("login"):
+            session = get_authenticated_session()
+
+        # Update Alivewatch from wikipedia
+        cache = None if args.no_cache else EntityCache(refresh=args.refresh_cache)
+        checkpoint = Checkpoint(resume=args.resume)
+        try:
+            with METRICS.phase("update"):
+                update(
+                    maxyear,
+                    minrank,
+                    maxrank,
+                    session,
+                    incremental=args.incremental,
+                    cache=cache,
+                    checkpoint=checkpoint,
+                    sweep=args.sweep,
+                    imprecise_budget=args.imprecise_budget,
+                    prioritise=args.prioritise,
+                    max_requests=args.max_requests,
+                    time_budget=args.time_budget,
+                    profiles=profiles,
+                    stream=args.stream,
+                )
+            checkpoint.clear()  # Only a failed run is worth resuming
+        finally:
+            checkpoint.close()
+            if cache is not None:
+                cache.close()
+
+        # Create reports
+        with METRICS.phase("report"):
+            report(
+                maxyear,
+                maxrank,
+                movement_periods=movement_periods,
+                minrank=minrank,
+                profiles=profiles,
+            )
+        completed = True
+    finally:
+        run = METRICS.save(completed)
+        totals = run["totals"]
+        print(
+            f"Run took {run['wall']:.0f}s: {totals['requests']} requests "
+            f"({totals['rate_limited']} rate limited, {totals['retries']} retries), "
+            f"{totals['bytes'] / 1e6:.1f} MB, {totals['cache_hits']} cache hits"
+        )
 
 
 if __name__ == "__main__":
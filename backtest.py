@@ -0,0 +1,327 @@
+# Project: Alivewatch
+# Backtest of the Alivewatch selection rules against the deaths recorded so far
+#
+# For every combination of minimum age, notability rank range and risk weighting in a grid,
+# works out which of the recorded deaths the list would have caught (the person was on it when
+# they died), where they would have been on it, and how long the list would be today.
+#
+# risk_factor orders the list by RISK_AGE_WEIGHT * age - notability rank; its other constants only
+# shift and scale everyone's score, so the age weight is the only weight that changes the order,
+# and is the one that is tuned.
+#
+# Only people that the daily runs have looked up have a recorded death, so the backtest can't
+# credit settings wider than those used so far with deaths nobody looked for.
+
+# Import libraries
+import argparse
+import itertools
+import os
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import AliveWatch as aw
+
+# The grid searched by default, around the current settings (see profiles.json)
+MIN_AGES = [80, 82, 85, 88, 90]
+MINRANKS = [1, 250, 500, 1000, 2000, 5000]
+MAXRANKS = [25000, 50000, 100000, 150000, 200000, 300000]
+AGE_WEIGHTS = [1000, 2000, 3300, 6600, 10000, 20000, 50000]
+# The lists were only put in priority order from this date
+SINCE = "2024-01-03"
+
+
+def load_history(path=None, since=SINCE):
+    """
+    Reads everything the backtest needs from the dataset, once.
+
+    Parameters:
+    path (str): The dataset to read. If None, uses the main dataset, or the watch table if there is none.
+    since (str): Only deaths from this date (YYYY-MM-DD) are counted.
+
+    Returns:
+    dict: birth, rank and death (the date of death, or NaT for the living) for everyone,
+    as NumPy arrays, and deaths (the positions of the deaths counted, in date order).
+    """
+    if path is None:
+        # The main dataset has everyone, but the watch table will do if it is all there is
+        path = (
+            aw.DATASET_PATH if os.path.exists(aw.DATASET_PATH) else aw.WATCH_TABLE_PATH
+        )
+    data = aw.load_dataset(
+        ["birth", "ranking_visib_5criteria", "deathstamp"], path=path
+    )
+    # A date only known to the month (day 00) is taken to be the middle of the month
+    stamps = data["deathstamp"].str.strip().str.replace(r"-00$", "-15", regex=True)
+    death = pd.to_datetime(stamps, format="%Y-%m-%d", errors="coerce").to_numpy()
+    counted = ~np.isnat(death) & (death >= np.datetime64(since))
+    deaths = np.flatnonzero(counted)
+    return {
+        "birth": data["birth"].to_numpy(dtype=np.int64),
+        "rank": data["ranking_visib_5criteria"].to_numpy(dtype=np.int64),
+        "death": death,
+        "deaths": deaths[np.argsort(death[deaths], kind="stable")],
+    }
+
+
+class ListGrid:
+    """
+    The lists made by every combination of minimum age, minimum rank and maximum rank.
+    Which of them a person is on only depends on which cell of the grid of those settings
+    they fall in, so people can be counted by cell and the counts turned into counts per list.
+    """
+
+    def __init__(self, min_ages, minranks, maxranks):
+        self.ages = np.unique(min_ages)
+        self.lows = np.unique(minranks)
+        self.highs = np.unique(maxranks)
+        self.shape = (len(self.ages) + 1, len(self.lows) + 1, len(self.highs) + 1)
+        self.size = int(np.prod(self.shape))
+        # Each list, as positions in the sorted settings
+        lists = np.array(list(itertools.product(min_ages, minranks, maxranks)))
+        self.min_age, self.low, self.high = lists.T
+        self.picks = (
+            np.searchsorted(self.ages, self.min_age),
+            np.searchsorted(self.lows, self.low),
+            np.searchsorted(self.highs, self.high),
+        )
+
+    def cells(self, births, ranks, year):
+        """
+        Finds the cell each person falls in.
+
+        Parameters:
+        births (array): Years of birth.
+        ranks (array): Notability ranks.
+        year (int): The year (ages are worked out as in AliveWatch, from the year alone).
+
+        Returns:
+        array: The cell of each person.
+        """
+        # The number of minimum ages they are old enough for, of minimum ranks they are no more
+        # famous than, and of maximum ranks they are more obscure than
+        age = np.searchsorted(self.ages, year - births, side="right")
+        low = np.searchsorted(self.lows, ranks, side="right")
+        high = np.searchsorted(self.highs, ranks, side="left")
+        return np.ravel_multi_index((age, low, high), self.shape)
+
+    def counts(self, cell_counts):
+        """
+        Turns counts of people by cell into counts of people on each list.
+
+        Parameters:
+        cell_counts (array): The counts, with the cells on the last axis.
+
+        Returns:
+        array: The counts, with the lists on the last axis.
+        """
+        grid = cell_counts.reshape(cell_counts.shape[:-1] + self.shape)
+        # On a list if old enough for its minimum age, no more famous than its minimum rank,
+        # and no more obscure than its maximum rank
+        grid = np.flip(np.flip(grid, -3).cumsum(-3), -3)[..., 1:, :, :]
+        grid = np.flip(np.flip(grid, -2).cumsum(-2), -2)[..., 1:, :]
+        grid = grid.cumsum(-1)[..., :-1]
+        return grid[(...,) + self.picks]
+
+    def one_hot(self, cells):
+        """
+        Counts each person on their own.
+
+        Parameters:
+        cells (array): The cell of each person.
+
+        Returns:
+        array: A row per person, with a 1 in their cell.
+        """
+        hot = np.zeros((len(cells), self.size), dtype=np.float32)
+        hot[np.arange(len(cells)), cells] = 1
+        return hot
+
+
+def evaluate(history, min_ages, minranks, maxranks, age_weights, today=None):
+    """
+    Backtests every combination of the settings.
+
+    A death is caught if the person was on the list when they died: old enough in the year they died
+    (as AliveWatch works out maxyear) and inside the notability rank range. Their rank at death is
+    1 + the number of people on the list at that moment (alive, old enough, in range) with a higher risk.
+
+    Parameters:
+    history (dict): As returned by load_history.
+    min_ages (list): The minimum ages to try.
+    minranks (list): The minimum notability ranks to try.
+    maxranks (list): The maximum notability ranks to try.
+    age_weights (list): The age weights to try (see RISK_AGE_WEIGHT in AliveWatch).
+    today (str): The date to work out the length of the list on (YYYY-MM-DD). Today if None.
+
+    Returns:
+    DataFrame: One row per combination: the settings, List Size (living people on the list today),
+    Caught, Missed, Hit Rate, and the Median, 90th percentile and Top 100 share of the rank at death.
+    """
+    birth, rank, death = history["birth"], history["rank"], history["death"]
+    deaths = history["deaths"]
+    today = np.datetime64(today or aw.todays_date())
+    grid = ListGrid(min_ages, minranks, maxranks)
+
+    alive_today = np.isnat(death) | (death > today)
+    year_today = today.astype("datetime64[Y]").astype(int) + 1970
+    today_cells = grid.cells(birth[alive_today], rank[alive_today], year_today)
+    list_size = grid.counts(np.bincount(today_cells, minlength=grid.size))
+
+    # The only people who can ever be on a list being tried
+    candidate = (birth <= year_today - min(min_ages)) & (rank >= min(minranks))
+    candidate &= rank <= max(maxranks)
+
+    death_years = death[deaths].astype("datetime64[Y]").astype(int) + 1970
+    ranks_at_death = np.zeros((len(age_weights), len(deaths), len(grid.min_age)))
+    caught = np.zeros((len(deaths), len(grid.min_age)), dtype=bool)
+    for year in np.unique(death_years):
+        in_year = np.flatnonzero(death_years == year)
+        who = deaths[in_year]
+        own_cells = grid.one_hot(grid.cells(birth[who], rank[who], year))
+        caught[in_year] = grid.counts(own_cells) > 0
+        # Everyone who could be on a list at some point in the year...
+        people = np.flatnonzero(
+            candidate
+            & (birth <= year - min(min_ages))
+            & (np.isnat(death) | (death >= np.datetime64(f"{year}-01-01")))
+        )
+        cells = grid.cells(birth[people], rank[people], year)
+        ages = year - birth[people]
+        # ... less those who died earlier in the year than each death (and the person themselves)
+        gone = np.flatnonzero(death[people] < np.datetime64(f"{year + 1}-01-01"))
+        gone_before = death[people[gone]][None, :] <= death[who][:, None]
+        gone_cells = grid.one_hot(cells[gone])
+
+        for w, weight in enumerate(age_weights):
+            score = weight * ages - rank[people]
+            own = weight * (year - birth[who]) - rank[who]
+            # Those with a higher risk are the first few in order of risk: count them by cell
+            order = np.argsort(-score, kind="stable")
+            higher = len(people) - np.searchsorted(score[order][::-1], own, "right")
+            by_higher = np.argsort(higher, kind="stable")
+            # Which deaths each person is above: everyone from the first whose count reaches past them
+            first_above = np.searchsorted(
+                higher[by_higher], np.arange(len(people)), side="right"
+            )
+            above = np.bincount(
+                first_above * grid.size + cells[order],
+                minlength=(len(who) + 1) * grid.size,
+            ).reshape(len(who) + 1, grid.size)
+            above_cells = np.empty((len(who), grid.size))
+            above_cells[by_higher] = above.cumsum(axis=0)[:-1]
+            gone_higher = gone_before & (score[gone][None, :] > own[:, None])
+            above_cells -= gone_higher.astype(np.float32) @ gone_cells
+            ranks_at_death[w, in_year] = grid.counts(above_cells) + 1
+
+    rows = []
+    for w, weight in enumerate(age_weights):
+        at_death = np.where(caught, ranks_at_death[w], np.nan)
+        counted = caught.sum(axis=0)
+        # Settings that catch nobody have no ranks at death
+        with warnings.catch_warnings(), np.errstate(invalid="ignore"):
+            warnings.simplefilter("ignore", RuntimeWarning)
+            median = np.nanmedian(at_death, axis=0)
+            p90 = np.nanpercentile(at_death, 90, axis=0)
+            top100 = (at_death <= 100).sum(axis=0) / counted
+        rows.append(
+            pd.DataFrame(
+                {
+                    "Min Age": grid.min_age,
+                    "Min Rank": grid.low,
+                    "Max Rank": grid.high,
+                    "Age Weight": weight,
+                    "List Size": list_size,
+                    "Caught": counted,
+                    "Missed": len(deaths) - counted,
+                    "Hit Rate": counted / max(len(deaths), 1),
+                    "Median Rank at Death": median,
+                    "90th Percentile Rank": p90,
+                    "Top 100 Share": top100,
+                }
+            )
+        )
+    return pd.concat(rows, ignore_index=True)
+
+
+def parse_list(text):
+    """
+    Parses a comma-separated list of whole numbers.
+
+    Parameters:
+    text (str): The list, e.g. '80,85,90'.
+
+    Returns:
+    list: The numbers.
+    """
+    return [int(value) for value in text.split(",")]
+
+
+def main(argv=None):
+    """
+    Command line entry point.
+
+    Parameters:
+    argv (list): The command line arguments. If None, uses sys.argv.
+
+    Returns:
+    None
+    """
+    parser = argparse.ArgumentParser(
+        description="Backtest Alivewatch's selection settings against the deaths recorded so far."
+    )
+    parser.add_argument(
+        "--dataset", help="the dataset to read (default: the main dataset)"
+    )
+    parser.add_argument(
+        "--since", default=SINCE, help=f"count deaths from this date (default: {SINCE})"
+    )
+    parser.add_argument("--min-ages", type=parse_list, default=MIN_AGES)
+    parser.add_argument("--minranks", type=parse_list, default=MINRANKS)
+    parser.add_argument("--maxranks", type=parse_list, default=MAXRANKS)
+    parser.add_argument("--age-weights", type=parse_list, default=AGE_WEIGHTS)
+    parser.add_argument(
+        "--max-list-size",
+        type=int,
+        help="only show settings whose list is at most this long today",
+    )
+    parser.add_argument("--top", type=int, default=20, help="rows to show")
+    parser.add_argument("--csv", help="also write every combination to this file")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    history = load_history(args.dataset, args.since)
+    loaded = time.perf_counter()
+    results = evaluate(
+        history, args.min_ages, args.minranks, args.maxranks, args.age_weights
+    )
+    print(
+        f"Evaluated {len(results)} combinations against {len(history['deaths'])} deaths "
+        f"in {time.perf_counter() - loaded:.2f}s (loading took {loaded - start:.2f}s)"
+    )
+    if args.csv:
+        results.to_csv(args.csv, index=False)
+
+    # The current settings, for comparison
+    main_profile = aw.load_profiles()[0]
+    current = results[
+        (results["Min Age"] == main_profile["min_age"])
+        & (results["Min Rank"] == main_profile["minrank"])
+        & (results["Max Rank"] == main_profile["maxrank"])
+        & (results["Age Weight"] == aw.RISK_AGE_WEIGHT)
+    ]
+    shown = results
+    if args.max_list_size is not None:
+        shown = shown[shown["List Size"] <= args.max_list_size]
+    shown = shown.sort_values(
+        ["Hit Rate", "Median Rank at Death"], ascending=[False, True], kind="stable"
+    )
+    pd.set_option("display.width", 200)
+    print(shown.head(args.top).round(3).to_string(index=False))
+    if len(current):
+        print("\nCurrent settings:")
+        print(current.round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
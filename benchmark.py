@@ -0,0 +1,266 @@
+# Project: Alivewatch
+# End-to-end benchmark of the daily run against the local Wikidata stand-in
+#
+# Builds a synthetic Alivewatch.csv.gz in a temporary directory, runs AliveWatch.main
+# there against mock_wikidata, and reports how long login, update and report took,
+# how much of that was spent waiting on the network, and how many requests were made.
+
+# Import libraries
+import argparse
+import functools
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import requests
+import pandas as pd
+import AliveWatch as aw
+import mock_wikidata
+
+PHASES = ["get_authenticated_session", "update", "report"]
+OCCUPATIONS = ["actor", "singer", "writer", "politician", "footballer", "painter"]
+AREAS = ["United_States", "United_Kingdom", "France", "Germany", "India"]
+
+
+def make_dataset(path, size, seed=0):
+    """
+    Writes a synthetic dataset with the same columns as Alivewatch.csv.gz.
+    Nobody is on Alivewatch yet, so the first run looks up everyone in range.
+
+    Parameters:
+    path (str): Where to write the dataset.
+    size (int): The number of people.
+    seed (int): The random seed.
+
+    Returns:
+    DataFrame: The dataset.
+    """
+    rng = random.Random(seed)
+    ranks = list(range(1, size + 1))
+    rng.shuffle(ranks)
+    data = pd.DataFrame(
+        {
+            "name": [f"Person_{i}_({rng.choice(OCCUPATIONS)})" for i in range(size)],
+            "birth": [rng.randint(1915, 2005) for _ in range(size)],
+            "death": "",
+            "level3_main_occ": [rng.choice(OCCUPATIONS) for _ in range(size)],
+            "gender": [rng.choice(["Male", "Female"]) for _ in range(size)],
+            "area1_of_rattachment": [rng.choice(AREAS) for _ in range(size)],
+            "ranking_visib_5criteria": ranks,
+            "wikidata_code": [f"Q{1000 + i}" for i in range(size)],
+            "deathstamp": " ",
+            "alivewatch?": 0,
+            "date_added_to_alivewatch": "",
+            "position_at_death": "",
+        }
+    )
+    data.to_csv(path, index=False, compression="gzip")
+    return data
+
+
+def pick_deaths(data, fraction, seed=0):
+    """
+    Chooses who the stand-in server will report as having died.
+
+    Parameters:
+    data (DataFrame): The dataset.
+    fraction (float): The fraction of people to kill off.
+    seed (int): The random seed.
+
+    Returns:
+    dict: Maps Wikidata ID to date of death (YYYY-MM-DD).
+    """
+    rng = random.Random(seed)
+    ids = data["wikidata_code"].sample(frac=fraction, random_state=seed)
+    return {id: f"{rng.randint(2020, 2025)}-{rng.randint(1, 12):02d}-15" for id in ids}
+
+
+def timed(function, timings, name):
+    """
+    Wraps a function so each call adds its wall and CPU time to timings[name].
+
+    Parameters:
+    function (callable): The function to wrap.
+    timings (dict): Where to add the times.
+    name (str): The key to add them under.
+
+    Returns:
+    callable: The wrapped function.
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timing = timings.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            timing["wall"] += time.perf_counter() - wall
+            timing["cpu"] += time.process_time() - cpu
+
+    return wrapper
+
+
+def run(
+    size=20000,
+    latency=0.05,
+    rate_limit=0.0,
+    rps=aw.REQUESTS_PER_SECOND,
+    deaths_fraction=0.002,
+    seed=0,
+    args=(),
+):
+    """
+    Runs the whole pipeline once against the stand-in server and measures it.
+
+    Parameters:
+    size (int): The number of people in the synthetic dataset.
+    latency (float): Seconds the stand-in server takes to answer each request.
+    rate_limit (float): The fraction of requests the stand-in answers with a 429.
+    rps (float): Requests per second allowed by the client's rate limiter.
+    deaths_fraction (float): The fraction of people the stand-in reports as dead.
+    seed (int): The random seed.
+    args (tuple): Extra command line arguments for AliveWatch.main.
+
+    Returns:
+    dict: The measurements.
+    """
+    timings = {}
+    network = {"wall": 0.0}
+    network_lock = threading.Lock()
+    original_request = requests.Session.request
+
+    def request(self, *request_args, **request_kwargs):
+        start = time.perf_counter()
+        try:
+            return original_request(self, *request_args, **request_kwargs)
+        finally:
+            with network_lock:
+                network["wall"] += time.perf_counter() - start
+
+    originals = {name: getattr(aw, name) for name in PHASES}
+    saved = (os.getcwd(), aw.API_URL, aw.SPARQL_URL, aw.RATE_LIMITER, dict(os.environ))
+    server = None
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            os.chdir(workdir)
+            for directory in ["data", "old_data", "history", "cache"]:
+                os.makedirs(directory, exist_ok=True)
+            data = make_dataset(aw.DATASET_PATH, size, seed)
+            mock = mock_wikidata.MockWikidata(
+                pick_deaths(data, deaths_fraction, seed),
+                latency=latency,
+                rate_limit=rate_limit,
+                seed=seed,
+            )
+            server, aw.API_URL = mock_wikidata.start(mock)
+            aw.SPARQL_URL = mock_wikidata.sparql_url(aw.API_URL)
+            aw.RATE_LIMITER = aw.RateLimiter(rate=rps)
+            os.environ["WD_USERNAME"] = "MockBot"
+            os.environ["WD_PASSWORD"] = "mock"
+            for name in PHASES:
+                setattr(aw, name, timed(originals[name], timings, name))
+            requests.Session.request = request
+
+            wall, cpu = time.perf_counter(), time.process_time()
+            aw.main(["--no-cache", *args])
+            timings["total"] = {
+                "wall": time.perf_counter() - wall,
+                "cpu": time.process_time() - cpu,
+            }
+        finally:
+            requests.Session.request = original_request
+            for name in PHASES:
+                setattr(aw, name, originals[name])
+            os.chdir(saved[0])
+            aw.API_URL, aw.SPARQL_URL, aw.RATE_LIMITER = saved[1:4]
+            os.environ.clear()
+            os.environ.update(saved[4])
+            aw._dataset_cache.clear()
+            if server is not None:
+                server.shutdown()
+
+    return {
+        "size": size,
+        "latency": latency,
+        "rate_limit": rate_limit,
+        "rps": rps,
+        "phases": {
+            "login": timings["get_authenticated_session"],
+            "update": timings["update"],
+            "report": timings["report"],
+            "total": timings["total"],
+        },
+        "network_wall": network["wall"],
+        "server": mock.stats,
+    }
+
+
+def main():
+    """
+    Command line entry point.
+
+    Parameters:
+    None
+
+    Returns:
+    None
+    """
+    parser = argparse.ArgumentParser(
+        description="Time a full Alivewatch run against a local Wikidata stand-in."
+    )
+    parser.add_argument("--size", type=int, default=20000, help="people in dataset")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="seconds per request"
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="fraction of requests to 429"
+    )
+    parser.add_argument(
+        "--rps",
+        type=float,
+        default=aw.REQUESTS_PER_SECOND,
+        help="client requests per second",
+    )
+    parser.add_argument(
+        "--deaths-fraction",
+        type=float,
+        default=0.002,
+        help="fraction of people reported dead",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args, extra = parser.parse_known_args()
+
+    results = run(
+        args.size,
+        args.latency,
+        args.rate_limit,
+        args.rps,
+        args.deaths_fraction,
+        args.seed,
+        extra,
+    )
+
+    print()
+    print(f"Benchmark: {args.size} people, {args.latency}s latency, {args.rps} req/s")
+    print(f"{'Phase':<10}{'Wall (s)':>10}{'CPU (s)':>10}")
+    for phase, timing in results["phases"].items():
+        print(f"{phase:<10}{timing['wall']:>10.2f}{timing['cpu']:>10.2f}")
+    print(
+        f"Waiting on the network: {results['network_wall']:.2f}s (summed over workers)"
+    )
+    stats = results["server"]
+    print(
+        f"Requests: {stats['requests']} ({stats['rate_limited']} rate limited), "
+        f"IDs: {stats['ids']}, bytes: {stats['bytes']}"
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
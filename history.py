@@ -0,0 +1,319 @@
+# Project: Alivewatch
+# Compact history of the daily Alivewatch reports
+#
+# Each report gets one file per month, e.g. history/2025-03-On_Alivewatch.jsonl.
+# The first line of a month holds the whole report; every later line only holds
+# the rows that changed since the day before. A month's file can therefore be
+# read on its own, and the whole history is a few dozen small text files rather
+# than thousands of near-identical CSVs.
+
+# Import libraries
+import argparse
+import difflib
+import functools
+import json
+import os
+import re
+import pandas as pd
+
+HISTORY_DIR = "history"
+REPORTS = [
+    "On_Alivewatch",
+    "Missed_by_alivewatch",
+    "Died_under_watch",
+    "Alivewatch_by_date_added",
+]
+# Before 2024-01-05 the list of people added was called Added_since_last
+LEGACY_NAMES = {"Added_since_last": "Alivewatch_by_date_added"}
+
+
+def month_path(report, date, directory=HISTORY_DIR):
+    """
+    Returns the path of the history file holding a report for a given date.
+
+    Parameters:
+    report (str): The name of the report, e.g. 'On_Alivewatch'.
+    date (str): The date in the format YYYY-MM-DD.
+    directory (str): The history directory.
+
+    Returns:
+    str: The path of the file.
+    """
+    return os.path.join(directory, f"{date[:7]}-{report}.jsonl")
+
+
+def frame_rows(frame):
+    """
+    Converts a report to the form it is stored in.
+    A leading column that just numbers the rows (like 'Priority Rank') is not stored,
+    because it would change for every row below someone who is added or removed.
+
+    Parameters:
+    frame (DataFrame): The report.
+
+    Returns:
+    tuple: (columns, numbered, rows) - the column names, whether the first column numbers the rows,
+    and the rows as tuples of strings (without the numbering column, if numbered).
+    """
+    frame = frame.fillna("").astype(str)
+    columns = list(frame.columns)
+    rows = list(frame.itertuples(index=False, name=None))
+    numbered = bool(rows) and all(
+        row[0] == str(n) for n, row in enumerate(rows, start=1)
+    )
+    if numbered:
+        rows = [row[1:] for row in rows]
+    return columns, numbered, rows
+
+
+def rows_frame(columns, numbered, rows):
+    """
+    Converts a stored report back into a DataFrame. The inverse of frame_rows.
+
+    Parameters:
+    columns (list): The column names.
+    numbered (bool): Whether the first column numbers the rows.
+    rows (list): The stored rows.
+
+    Returns:
+    DataFrame: The report, with every value as a string.
+    """
+    if numbered:
+        rows = [(str(n),) + row for n, row in enumerate(rows, start=1)]
+    return pd.DataFrame(rows, columns=columns, dtype=str)
+
+
+def diff_rows(old, new):
+    """
+    Works out how to turn one day's rows into the next day's.
+
+    Parameters:
+    old (list): The previous rows.
+    new (list): The current rows.
+
+    Returns:
+    list: Operations of the form [start, end, rows], meaning old[start:end] is replaced by rows.
+    """
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    return [
+        [i1, i2, [list(row) for row in new[j1:j2]]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_ops(rows, ops):
+    """
+    Applies the operations made by diff_rows.
+
+    Parameters:
+    rows (list): The previous rows.
+    ops (list): The operations.
+
+    Returns:
+    list: The current rows.
+    """
+    rows = list(rows)
+    for start, end, new in reversed(ops):  # Work backwards so positions stay valid
+        rows[start:end] = [tuple(row) for row in new]
+    return rows
+
+
+@functools.lru_cache(maxsize=32)
+def _read_month(path, mtime):
+    states = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if "rows" in entry:  # A whole report
+                columns, numbered = entry["columns"], entry["numbered"]
+                rows = [tuple(row) for row in entry["rows"]]
+            else:  # Changes since the previous entry
+                columns, numbered, rows = states[-1][1:]
+                rows = apply_ops(rows, entry["ops"])
+            states.append((entry["date"], columns, numbered, rows))
+    return states
+
+
+def read_month(path):
+    """
+    Reads a month's history file. Parsed files are cached until they change.
+
+    Parameters:
+    path (str): The path of the file.
+
+    Returns:
+    list: (date, columns, numbered, rows) for each entry in the file, oldest first.
+    """
+    if not os.path.exists(path):
+        return []
+    return _read_month(path, os.path.getmtime(path))
+
+
+def append_snapshot(report, date, frame, directory=HISTORY_DIR):
+    """
+    Adds a day's report to the history.
+
+    Parameters:
+    report (str): The name of the report, e.g. 'On_Alivewatch'.
+    date (str): The date of the report in the format YYYY-MM-DD.
+    frame (DataFrame): The report.
+    directory (str): The history directory.
+
+    Returns:
+    None
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = month_path(report, date, directory)
+    columns, numbered, rows = frame_rows(frame)
+    states = read_month(path)
+    if states and states[-1][1:3] == (columns, numbered):
+        entry = {"date": date, "ops": diff_rows(states[-1][3], rows)}
+    else:  # First report of the month, or the columns have changed
+        entry = {
+            "date": date,
+            "columns": columns,
+            "numbered": numbered,
+            "rows": [list(row) for row in rows],
+        }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+@functools.lru_cache(maxsize=None)
+def _snapshot_dates(directory, listing):
+    dates = set()
+    for name, _ in listing:
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            for line in f:
+                dates.add(line[9:19])  # Every line starts {"date":"YYYY-MM-DD"
+    return sorted(dates)
+
+
+def snapshot_dates(report, directory=HISTORY_DIR):
+    """
+    Returns the dates for which a report is in the history.
+
+    Parameters:
+    report (str): The name of the report, e.g. 'On_Alivewatch'.
+    directory (str): The history directory.
+
+    Returns:
+    list: The dates, in the format YYYY-MM-DD, oldest first.
+    """
+    if not os.path.isdir(directory):
+        return []
+    pattern = re.compile(r"\d{4}-\d{2}-" + re.escape(report) + r"\.jsonl$")
+    listing = tuple(
+        (name, os.path.getmtime(os.path.join(directory, name)))
+        for name in sorted(os.listdir(directory))
+        if pattern.match(name)
+    )
+    return _snapshot_dates(directory, listing)
+
+
+def read_snapshot(report, date, directory=HISTORY_DIR):
+    """
+    Returns a report as it was on a given date.
+
+    Parameters:
+    report (str): The name of the report, e.g. 'On_Alivewatch'.
+    date (str): The date in the format YYYY-MM-DD.
+    directory (str): The history directory.
+
+    Returns:
+    DataFrame: The report, with every value as a string, or None if there is no report for that date.
+    """
+    found = None
+    for state in read_month(month_path(report, date, directory)):
+        if state[0] == date:
+            found = state  # A report re-run on the same day replaces the earlier one
+    if found is None:
+        return None
+    return rows_frame(*found[1:])
+
+
+def iter_snapshots(report, directory=HISTORY_DIR):
+    """
+    Yields every day's report from the history, oldest first.
+
+    Parameters:
+    report (str): The name of the report, e.g. 'On_Alivewatch'.
+    directory (str): The history directory.
+
+    Yields:
+    tuple: (date, DataFrame)
+    """
+    months = sorted({date[:7] for date in snapshot_dates(report, directory)})
+    for month in months:
+        states = read_month(month_path(report, month + "-01", directory))
+        for n, state in enumerate(states):
+            # Skip entries that were replaced by a re-run on the same day
+            if n + 1 < len(states) and states[n + 1][0] == state[0]:
+                continue
+            yield state[0], rows_frame(*state[1:])
+
+
+def backfill(old_data="old_data", directory=HISTORY_DIR):
+    """
+    Builds the history from scratch out of the dated CSVs in old_data.
+
+    Parameters:
+    old_data (str): The directory holding the dated CSVs.
+    directory (str): The history directory. Any history files already there are replaced.
+
+    Returns:
+    None
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".jsonl"):
+            os.remove(os.path.join(directory, name))
+
+    # Days whose report was the same as the day before only have an entry in the manifest,
+    # pointing to the file they are the same as
+    manifest = {}
+    if os.path.exists(os.path.join(old_data, "manifest.json")):
+        with open(os.path.join(old_data, "manifest.json")) as f:
+            manifest = json.load(f)
+
+    files = []
+    for name in os.listdir(old_data) + list(manifest):
+        match = re.match(r"(\d{4}-\d{2}-\d{2})-(\w+)\.csv$", name)
+        if match:
+            report = LEGACY_NAMES.get(match.group(2), match.group(2))
+            if report in REPORTS:
+                files.append((match.group(1), report, manifest.get(name, name)))
+
+    for date, report, name in sorted(files):
+        frame = pd.read_csv(os.path.join(old_data, name), dtype=str, na_filter=False)
+        append_snapshot(report, date, frame, directory)
+    print(f"Imported {len(files)} files from {old_data} into {directory}")
+
+
+def main():
+    """
+    Command line entry point.
+
+    Parameters:
+    None
+
+    Returns:
+    None
+    """
+    parser = argparse.ArgumentParser(description="Manage the Alivewatch history.")
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="rebuild the history from the dated CSVs in old_data",
+    )
+    parser.add_argument("--old-data", default="old_data", help="where the CSVs are")
+    args = parser.parse_args()
+    if args.backfill:
+        backfill(args.old_data)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
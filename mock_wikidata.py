@@ -0,0 +1,360 @@
+# Project: Alivewatch
+# A local stand-in for the parts of the Wikidata API that Alivewatch uses,
+# so the pipeline can be run and timed without credentials or network access.
+#
+# Supports: login token, login, userinfo, wbgetentities (P570 claims, up to 50 IDs per call),
+# action=query&prop=info (latest revision IDs, up to 500 per call for a bot with apihighlimits)
+# and, at /sparql, the death sweep query.
+# Logins are tracked by a session cookie, and requests made with assert=user fail once the
+# login has expired. Latency, 429 responses and expired logins can be injected.
+
+# Import libraries
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Wikidata's limit for wbgetentities and prop=info, and for prop=info with apihighlimits (bots)
+MAX_IDS = 50
+HIGH_MAX_IDS = 500
+LOGIN_TOKEN = "mocklogintoken+\\"
+
+
+class MockWikidata:
+    """
+    The state of the stand-in server: who has died, the current revision of each item,
+    how the server should misbehave, and counts of the requests it has served.
+    """
+
+    def __init__(
+        self,
+        deaths=None,
+        revisions=None,
+        latency=0.0,
+        rate_limit=0.0,
+        retry_after=1,
+        max_ids=MAX_IDS,
+        high_limits=True,
+        seed=None,
+    ):
+        self.deaths = deaths or {}  # Maps Wikidata ID to date of death (YYYY-MM-DD)
+        self.revisions = revisions or {}  # Maps Wikidata ID to revision; default 1
+        self.latency = latency  # Seconds added to every response
+        self.rate_limit = rate_limit  # Fraction of requests answered with a 429
+        self.retry_after = retry_after  # Retry-After header sent with a 429
+        self.max_ids = max_ids
+        self.high_limits = high_limits  # Whether the bot has apihighlimits
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sessions = set()  # Session cookies of the logins that are still valid
+        self.stats = {
+            "requests": 0,
+            "rate_limited": 0,
+            "ids": 0,
+            "bytes": 0,
+            "logins": 0,
+        }
+
+    def expire_sessions(self):
+        """
+        Ends every login, as if they had all expired.
+
+        Parameters:
+        None
+
+        Returns:
+        None
+        """
+        with self.lock:
+            self.sessions.clear()
+
+    def revision(self, id):
+        """
+        Returns the current revision of an item.
+
+        Parameters:
+        id (str): The Wikidata ID.
+
+        Returns:
+        int: The revision ID.
+        """
+        return self.revisions.get(id, 1)
+
+    def entity(self, id):
+        """
+        Returns the entity for a Wikidata ID, as wbgetentities would with props=claims.
+
+        Parameters:
+        id (str): The Wikidata ID.
+
+        Returns:
+        dict: The entity.
+        """
+        claims = {}
+        if id in self.deaths:
+            claims["P570"] = [
+                {
+                    "mainsnak": {
+                        "snaktype": "value",
+                        "property": "P570",
+                        "datavalue": {
+                            "value": {
+                                "time": "+" + self.deaths[id] + "T00:00:00Z",
+                                "precision": 11,
+                            },
+                            "type": "time",
+                        },
+                    },
+                    "rank": "normal",
+                }
+            ]
+        return {
+            "type": "item",
+            "id": id,
+            "lastrevid": self.revision(id),
+            "claims": claims,
+        }
+
+    def sparql(self, params):
+        """
+        Answers a death sweep query: which of the items in its VALUES list have a date of death.
+
+        Parameters:
+        params (dict): The request parameters, including the query.
+
+        Returns:
+        tuple: (HTTP status, response body as a dict, extra headers)
+        """
+        values = re.search(r"VALUES \?item \{([^}]*)\}", params.get("query", ""))
+        if values is None:
+            return 400, {"error": "Unsupported query"}, {}
+        ids = re.findall(r"wd:(Q\d+)", values.group(1))
+        with self.lock:
+            self.stats["ids"] += len(ids)
+        bindings = [
+            {"item": {"type": "uri", "value": "http://www.wikidata.org/entity/" + id}}
+            for id in ids
+            if id in self.deaths
+        ]
+        return 200, {"head": {"vars": ["item"]}, "results": {"bindings": bindings}}, {}
+
+    def handle(self, params, path="/w/api.php", session=None):
+        """
+        Answers an API request.
+
+        Parameters:
+        params (dict): The request parameters (GET query and POST form combined).
+        path (str): The path requested - /sparql for the query service, otherwise the API.
+        session (str): The value of the session cookie sent with the request, if any.
+
+        Returns:
+        tuple: (HTTP status, response body as a dict, extra headers)
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            limited = self.random.random() < self.rate_limit
+            if limited:
+                self.stats["rate_limited"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if limited:
+            return (
+                429,
+                {"error": {"code": "ratelimited"}},
+                {"Retry-After": str(self.retry_after)},
+            )
+
+        if path.endswith("/sparql"):
+            return self.sparql(params)
+        action = params.get("action")
+        if action == "query" and params.get("meta") == "tokens":
+            return 200, {"query": {"tokens": {"logintoken": LOGIN_TOKEN}}}, {}
+        if action == "login":
+            if params.get("lgtoken") != LOGIN_TOKEN:
+                return 200, {"login": {"result": "WrongToken"}}, {}
+            with self.lock:
+                self.stats["logins"] += 1
+                session = f"mock{self.stats['logins']}"
+                self.sessions.add(session)
+            return (
+                200,
+                {"login": {"result": "Success", "lgusername": "MockBot"}},
+                {"Set-Cookie": f"mocksession={session}; Path=/"},
+            )
+
+        with self.lock:
+            logged_in = session in self.sessions
+        if action == "query" and params.get("meta") == "userinfo":
+            if logged_in:
+                userinfo = {"id": 1, "name": "MockBot", "rights": ["read", "bot"]}
+                if self.high_limits:
+                    userinfo["rights"].append("apihighlimits")
+                return 200, {"query": {"userinfo": userinfo}}, {}
+            userinfo = {"id": 0, "name": "127.0.0.1", "anon": ""}
+            return 200, {"query": {"userinfo": userinfo}}, {}
+        if params.get("assert") == "user" and not logged_in:
+            return 200, {"error": {"code": "assertuserfailed"}}, {}
+
+        if action == "wbgetentities":
+            ids = params.get("ids", "").split("|")
+        elif action == "query" and params.get("prop") == "info":
+            ids = params.get("titles", "").split("|")
+        else:
+            return 200, {"error": {"code": "badvalue", "info": "Unsupported"}}, {}
+        limit = self.max_ids
+        if action == "query" and logged_in and self.high_limits:
+            limit = HIGH_MAX_IDS
+        if len(ids) > limit:
+            return 200, {"error": {"code": "toomanyvalues"}}, {}
+        with self.lock:
+            self.stats["ids"] += len(ids)
+
+        if action == "wbgetentities":
+            return (
+                200,
+                {"entities": {id: self.entity(id) for id in ids}, "success": 1},
+                {},
+            )
+        pages = {
+            str(n): {"ns": 0, "title": id, "lastrevid": self.revision(id)}
+            for n, id in enumerate(ids, start=1)
+        }
+        return 200, {"query": {"pages": pages}}, {}
+
+
+def make_handler(mock):
+    """
+    Makes an HTTP request handler class that passes requests to the stand-in.
+
+    Parameters:
+    mock (MockWikidata): The stand-in server state.
+
+    Returns:
+    class: The handler class.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep connections alive, like the real API
+
+        def respond(self, params):
+            cookies = SimpleCookie(self.headers.get("Cookie", ""))
+            session = cookies["mocksession"].value if "mocksession" in cookies else None
+            status, body, headers = mock.handle(
+                params, urlparse(self.path).path, session
+            )
+            content = json.dumps(body).encode("utf-8")
+            with mock.lock:
+                mock.stats["bytes"] += len(content)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(content)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            self.respond({key: values[-1] for key, values in query.items()})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            form = parse_qs(self.rfile.read(length).decode("utf-8"))
+            query = parse_qs(urlparse(self.path).query)
+            params = {key: values[-1] for key, values in query.items()}
+            params.update({key: values[-1] for key, values in form.items()})
+            self.respond(params)
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output readable
+
+    return Handler
+
+
+def start(mock, host="127.0.0.1", port=0):
+    """
+    Starts the stand-in server in a background thread.
+
+    Parameters:
+    mock (MockWikidata): The stand-in server state.
+    host (str): The address to listen on.
+    port (int): The port to listen on; 0 picks a free port.
+
+    Returns:
+    tuple: (server, API URL) - call server.shutdown() to stop it.
+    The query service is at the same address, with /sparql in place of /w/api.php.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(mock))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/w/api.php"
+
+
+def sparql_url(api_url):
+    """
+    Returns the address of the stand-in query service, given that of its API.
+
+    Parameters:
+    api_url (str): The API URL returned by start.
+
+    Returns:
+    str: The query service URL.
+    """
+    return api_url.replace("/w/api.php", "/sparql")
+
+
+def main():
+    """
+    Command line entry point: runs the stand-in server until interrupted.
+
+    Parameters:
+    None
+
+    Returns:
+    None
+    """
+    parser = argparse.ArgumentParser(description="Run a local stand-in for Wikidata.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per request"
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="fraction of requests to 429"
+    )
+    parser.add_argument(
+        "--no-high-limits",
+        action="store_true",
+        help="answer as if the bot didn't have apihighlimits",
+    )
+    parser.add_argument(
+        "--deaths",
+        help="JSON file mapping Wikidata IDs to dates of death (YYYY-MM-DD)",
+    )
+    args = parser.parse_args()
+    deaths = {}
+    if args.deaths:
+        with open(args.deaths) as f:
+            deaths = json.load(f)
+    mock = MockWikidata(
+        deaths,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        high_limits=not args.no_high_limits,
+    )
+    server, url = start(mock, port=args.port)
+    print(f"Mock Wikidata API at {url} - set WD_API_URL to use it")
+    print(f"Mock query service at {sparql_url(url)} - set WD_SPARQL_URL to use it")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# Project: Alivewatch
+# Precomputed data for the web pages
+#
+# Rather than downloading and parsing a whole CSV on every visit, index.html and died.html
+# read a small first page, then further pages only as they are needed, and a search index
+# only when someone searches. Each report gets a directory, e.g. data/pages/On_Alivewatch/:
+#   first.json   - the column names, the number of rows and pages, and the first rows
+#   page-N.json  - rows (N-1)*PAGE_SIZE onwards, PAGE_SIZE at a time
+#   search.json  - each row's searchable text (name and profession), in row order
+# Every file is also written pre-compressed as .gz, and as .br if brotli is installed,
+# for web servers that can serve pre-compressed files.
+
+# Import libraries
+import argparse
+import gzip
+import json
+import os
+import re
+import unicodedata
+import pandas as pd
+
+try:
+    import brotli
+except ImportError:  # Optional - only the .br files need it
+    brotli = None
+
+PAGES_DIR = "data/pages"
+# The reports the web pages show, and the columns that can be searched
+PUBLISHED = {
+    "On_Alivewatch": ["Name", "Profession"],
+    "Died_under_watch": ["Name", "Profession"],
+}
+FIRST_PAGE_SIZE = 50  # Enough to fill the screen
+PAGE_SIZE = 250
+
+
+def search_text(values):
+    """
+    Makes the searchable form of some text: lower case, with accents removed,
+    so 'Zoë' is found by 'zoe'. index.html and died.html do the same to what is typed.
+
+    Parameters:
+    values (list): The pieces of text, e.g. a name and a profession.
+
+    Returns:
+    str: The searchable text.
+    """
+    text = unicodedata.normalize("NFD", " ".join(values))
+    text = "".join(c for c in text if not unicodedata.category(c).startswith("M"))
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def write_compressed(path, content):
+    """
+    Writes a file along with its pre-compressed versions, unless the file already holds this content.
+    The .gz file has no timestamp, so it only changes when the content does.
+
+    Parameters:
+    path (str): The location of the file.
+    content (bytes): The contents.
+
+    Returns:
+    bool: True if the files were written.
+    """
+    unchanged = os.path.exists(path) and os.path.exists(path + ".gz")
+    if unchanged and brotli is not None:
+        unchanged = os.path.exists(path + ".br")
+    if unchanged:
+        with open(path, "rb") as f:
+            unchanged = f.read() == content
+    if unchanged:
+        return False
+
+    with open(path, "wb") as f:
+        f.write(content)
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(content))
+    return True
+
+
+def to_json(value):
+    """
+    Encodes a value as compact JSON.
+
+    Parameters:
+    value: The value.
+
+    Returns:
+    bytes: The JSON, encoded as UTF-8.
+    """
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def publish(report, frame, directory=PAGES_DIR):
+    """
+    Writes the precomputed pages and search index for a report.
+
+    Parameters:
+    report (str): The name of the report, e.g. 'On_Alivewatch'.
+    frame (DataFrame): The report, already sorted as it should be shown.
+    directory (str): The directory to write the report's directory in.
+
+    Returns:
+    int: The number of pages.
+    """
+    path = os.path.join(directory, report)
+    os.makedirs(path, exist_ok=True)
+    frame = frame.fillna("").astype(str)
+    rows = [list(row) for row in frame.itertuples(index=False, name=None)]
+    pages = max(1, -(-len(rows) // PAGE_SIZE))
+
+    write_compressed(
+        os.path.join(path, "first.json"),
+        to_json(
+            {
+                "columns": list(frame.columns),
+                "total": len(rows),
+                "page_size": PAGE_SIZE,
+                "pages": pages,
+                "rows": rows[:FIRST_PAGE_SIZE],
+            }
+        ),
+    )
+    for page in range(pages):
+        write_compressed(
+            os.path.join(path, f"page-{page + 1}.json"),
+            to_json(rows[page * PAGE_SIZE : (page + 1) * PAGE_SIZE]),
+        )
+    searchable = PUBLISHED.get(report, ["Name"])
+    write_compressed(
+        os.path.join(path, "search.json"),
+        to_json([search_text(values) for values in frame[searchable].values]),
+    )
+
+    # Remove pages left over from when the report was longer
+    for name in os.listdir(path):
+        match = re.match(r"page-(\d+)\.json", name)
+        if match and int(match.group(1)) > pages:
+            os.remove(os.path.join(path, name))
+    return pages
+
+
+def main():
+    """
+    Command line entry point: rebuilds the pages from the CSVs in data/.
+
+    Parameters:
+    None
+
+    Returns:
+    None
+    """
+    parser = argparse.ArgumentParser(
+        description="Rebuild the precomputed data for the web pages."
+    )
+    parser.add_argument("--data", default="data", help="where the report CSVs are")
+    args = parser.parse_args()
+    for report in PUBLISHED:
+        frame = pd.read_csv(
+            os.path.join(args.data, report + ".csv"), dtype=str, na_filter=False
+        )
+        pages = publish(report, frame, os.path.join(args.data, "pages"))
+        print(f"Wrote {pages} pages for {report}")
+
+
+if __name__ == "__main__":
+    main()
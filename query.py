@@ -0,0 +1,452 @@
+# Project: Alivewatch
+# Questions about the history of the Alivewatch list
+#
+# Answers questions like "what was X's priority on each day?" or "how long do people last once
+# they reach the top 10?" from the history (see history.py), without opening the daily files.
+# The positions of everyone on every day's list are indexed into a single table, saved in
+# cache/history_index.npz, and only rebuilt when the history changes.
+#
+#   python query.py trajectory "Eva Marie Saint"   - the person's priority on each day
+#   python query.py time-on-watch                  - how long each person has been (or was) on the list
+#   python query.py hits                           - deaths under watch vs missed, by notability rank band
+#   python query.py survival --top 10              - how long people survive after reaching the top 10
+
+# Import libraries
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+import history
+import pages
+
+INDEX_PATH = "cache/history_index.npz"
+# The lists were only put in priority order from this date
+RANKED_SINCE = "2024-01-03"
+# Notability rank bands for the hit rates (see AliveWatch.DEFAULT_PROFILE for the range)
+RANK_BANDS = [1000, 3000, 10000, 30000, 100000]
+# Days after reaching the top of the list at which to report the survival rate
+SURVIVAL_HORIZONS = [30, 90, 180, 365]
+
+
+class HistoryIndex:
+    """
+    Everyone's position on every day's list: ranks[d, p] is the priority of names[p] on dates[d],
+    or 0 if they weren't on the list that day.
+    """
+
+    def __init__(self, dates, names, ranks):
+        self.dates = [str(date) for date in dates]
+        self.names = [str(name) for name in names]
+        self.ranks = ranks
+        self.columns = {name: p for p, name in enumerate(self.names)}
+
+    def find(self, query):
+        """
+        Finds people by name: an exact match if there is one, otherwise everyone whose
+        name contains the query (ignoring case and accents).
+
+        Parameters:
+        query (str): The name, or part of it.
+
+        Returns:
+        list: The matching names.
+        """
+        if query in self.columns:
+            return [query]
+        wanted = pages.search_text([query])
+        return [name for name in self.names if wanted in pages.search_text([name])]
+
+    def first_dates(self, top=None):
+        """
+        Returns when each person first appeared on the list (or in its top places).
+
+        Parameters:
+        top (int): Only count days on which the person was in the top this many places. None for any place.
+
+        Returns:
+        Series: The first date for each name, for the names that ever qualified.
+        """
+        on = self.ranks > 0
+        if top is not None:
+            on &= self.ranks <= top
+        qualified = on.any(axis=0)
+        first = on.argmax(axis=0)
+        return pd.Series(
+            np.array(self.dates)[first[qualified]],
+            index=np.array(self.names)[qualified],
+        )
+
+
+def index_key(directory=history.HISTORY_DIR):
+    """
+    Describes the history files the index is built from, so a changed history can be detected.
+
+    Parameters:
+    directory (str): The history directory.
+
+    Returns:
+    str: The names, sizes and modification times of the On_Alivewatch history files.
+    """
+    if not os.path.isdir(directory):
+        return "[]"
+    files = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith("-On_Alivewatch.jsonl"):
+            stat = os.stat(os.path.join(directory, name))
+            files.append([name, stat.st_size, stat.st_mtime])
+    return json.dumps(files)
+
+
+def build_index(directory=history.HISTORY_DIR):
+    """
+    Indexes the position of everyone on every day's Alivewatch list, from RANKED_SINCE.
+
+    Parameters:
+    directory (str): The history directory.
+
+    Returns:
+    HistoryIndex: The index.
+    """
+    # Only needed when the index is rebuilt, and slow to import
+    from AliveWatch import clean_names
+
+    dates, names, columns, entries = [], [], {}, []
+    for date, frame in history.iter_snapshots("On_Alivewatch", directory):
+        if date < RANKED_SINCE:
+            continue
+        d = len(dates)
+        dates.append(date)
+        # Until 2025-02-22 the lists had the dataset's column names, and names with underscores
+        if "Name" in frame.columns:
+            frame_names = frame["Name"]
+        else:
+            frame_names = clean_names(frame["name"])
+        for rank, name in enumerate(frame_names, start=1):
+            if name not in columns:
+                columns[name] = len(names)
+                names.append(name)
+            entries.append((d, columns[name], rank))
+
+    ranks = np.zeros((len(dates), len(names)), dtype=np.int32)
+    if entries:
+        d, p, rank = np.array(entries).T
+        ranks[d, p] = rank
+    return HistoryIndex(dates, names, ranks)
+
+
+def load_index(directory=history.HISTORY_DIR, path=INDEX_PATH):
+    """
+    Returns the index of the history, from the cache if the history hasn't changed since it was built.
+
+    Parameters:
+    directory (str): The history directory.
+    path (str): The cached index.
+
+    Returns:
+    HistoryIndex: The index.
+    """
+    key = index_key(directory)
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            if str(cached["key"]) == key:
+                return HistoryIndex(cached["dates"], cached["names"], cached["ranks"])
+
+    index = build_index(directory)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(
+        path,
+        key=key,
+        dates=np.array(index.dates, dtype=str),
+        names=np.array(index.names, dtype=str),
+        ranks=index.ranks,
+    )
+    return index
+
+
+def latest_report(report, directory=history.HISTORY_DIR):
+    """
+    Returns the most recent copy of a report in the history.
+
+    Parameters:
+    report (str): The name of the report, e.g. 'Died_under_watch'.
+    directory (str): The history directory.
+
+    Returns:
+    DataFrame: The report, with every value as a string. Empty if the report isn't in the history.
+    """
+    dates = history.snapshot_dates(report, directory)
+    if not dates:
+        return pd.DataFrame(columns=["Name", "Birth Year", "Date of Death"], dtype=str)
+    return history.read_snapshot(report, dates[-1], directory)
+
+
+def death_dates(dates):
+    """
+    Converts dates of death to timestamps. A date only known to the month (day 00)
+    is taken to be the middle of the month.
+
+    Parameters:
+    dates (Series): Dates of death in the format YYYY-MM-DD.
+
+    Returns:
+    Series: The dates as timestamps (NaT where they can't be read).
+    """
+    dates = dates.str.replace(r"-00$", "-15", regex=True)
+    return pd.to_datetime(dates, format="%Y-%m-%d", errors="coerce")
+
+
+def trajectory(index, name):
+    """
+    Returns a person's priority on each day they were on the list.
+
+    Parameters:
+    index (HistoryIndex): The index.
+    name (str): The person's name, exactly as on the list.
+
+    Returns:
+    DataFrame: Date and Priority Rank, oldest first.
+    """
+    ranks = index.ranks[:, index.columns[name]]
+    on = ranks > 0
+    return pd.DataFrame({"Date": np.array(index.dates)[on], "Priority Rank": ranks[on]})
+
+
+def time_on_watch(index, died):
+    """
+    Works out how long each person has been on the list, or was on it before they died.
+
+    Parameters:
+    index (HistoryIndex): The index.
+    died (DataFrame): The Died_under_watch report.
+
+    Returns:
+    DataFrame: Name, First Seen, Last Seen, Days Listed (the number of daily lists they were on),
+    Best Rank and Date of Death (empty if still alive), longest on the list first.
+    """
+    on = index.ranks > 0
+    listed = on.any(axis=0)
+    dates = np.array(index.dates)
+    last = len(index.dates) - 1 - on[::-1].argmax(axis=0)
+    best = np.where(on, index.ranks, np.iinfo(index.ranks.dtype).max).min(axis=0)
+    frame = pd.DataFrame(
+        {
+            "Name": np.array(index.names)[listed],
+            "First Seen": dates[on.argmax(axis=0)[listed]],
+            "Last Seen": dates[last[listed]],
+            "Days Listed": on.sum(axis=0)[listed],
+            "Best Rank": best[listed],
+        }
+    )
+    deaths = died.drop_duplicates("Name").set_index("Name")["Date of Death"]
+    frame["Date of Death"] = frame["Name"].map(deaths).fillna("")
+    return frame.sort_values("Days Listed", ascending=False, kind="stable")
+
+
+def notability_ranks(path=None):
+    """
+    Looks up the notability rank of everyone who has died, from the watch table
+    (or the main dataset if there is no watch table).
+
+    Parameters:
+    path (str): The dataset to read. If None, uses the watch table or the main dataset.
+
+    Returns:
+    Series: The notability rank, indexed by (name as shown in the reports, birth year as text).
+    """
+    # Only needed for the hit rates, and slow to import
+    import AliveWatch as aw
+
+    if path is None:
+        path = (
+            aw.WATCH_TABLE_PATH
+            if os.path.exists(aw.WATCH_TABLE_PATH)
+            else aw.DATASET_PATH
+        )
+    if not os.path.exists(path):
+        print(f"⚠️ {path} not found - notability ranks unknown")
+        return pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[], []]))
+    data = aw.load_dataset(["name", "birth", "ranking_visib_5criteria"], path=path)
+    index = pd.MultiIndex.from_arrays(
+        [aw.clean_names(data["name"]), data["birth"].astype(str)]
+    )
+    ranks = pd.Series(data["ranking_visib_5criteria"].to_numpy(), index=index)
+    return ranks[~ranks.index.duplicated()]
+
+
+def hit_rates(died, missed, ranks, bands=RANK_BANDS):
+    """
+    Compares the deaths Alivewatch caught (Died_under_watch) with those it missed
+    (Missed_by_alivewatch), by notability rank band.
+
+    Parameters:
+    died (DataFrame): The Died_under_watch report.
+    missed (DataFrame): The Missed_by_alivewatch report.
+    ranks (Series): The notability ranks, as returned by notability_ranks.
+    bands (list): The upper limit of each band, in increasing order.
+
+    Returns:
+    DataFrame: For each band: Died Under Watch, Missed and Hit Rate (the fraction caught).
+    Deaths whose rank can't be found are counted in an 'unknown' band.
+    """
+    edges = [0] + list(bands) + [np.inf]
+    labels = [f"{low + 1}-{high}" for low, high in zip(edges, edges[1:])]
+    labels[-1] = f"over {bands[-1]}"
+
+    def band_counts(report):
+        keys = pd.MultiIndex.from_arrays([report["Name"], report["Birth Year"]])
+        rank = pd.Series(ranks.reindex(keys).to_numpy())
+        band = pd.cut(rank, edges, labels=labels).astype(object).fillna("unknown")
+        return band.value_counts()
+
+    table = pd.DataFrame(
+        {"Died Under Watch": band_counts(died), "Missed": band_counts(missed)}
+    )
+    table = table.reindex(
+        [label for label in labels + ["unknown"] if label in table.index]
+    )
+    table = table.fillna(0).astype(int)
+    table["Hit Rate"] = (
+        table["Died Under Watch"] / (table["Died Under Watch"] + table["Missed"])
+    ).round(3)
+    table.index.name = "Notability Rank"
+    return table
+
+
+def survival(index, died, top=10, horizons=SURVIVAL_HORIZONS):
+    """
+    Estimates how long people survive after first reaching the top places on the list, with
+    the Kaplan-Meier estimator: people who are still alive count for as long as they've been followed.
+
+    Parameters:
+    index (HistoryIndex): The index.
+    died (DataFrame): The Died_under_watch report.
+    top (int): The number of top places.
+    horizons (list): The days after reaching the top at which to give the survival rate.
+
+    Returns:
+    dict: people (the number who reached the top), deaths, median_days (the estimated median survival,
+    None if more than half are still alive) and survival (the fraction surviving each horizon).
+    """
+    reached = pd.to_datetime(index.first_dates(top))
+    deaths = died.drop_duplicates("Name").set_index("Name")["Date of Death"]
+    deaths = death_dates(deaths.reindex(reached.index))
+    # Deaths are only on the list from the day after, so can't be before reaching the top
+    dead = deaths.notna() & (deaths >= reached)
+    end = deaths.where(dead, pd.Timestamp(index.dates[-1]) if index.dates else pd.NaT)
+    days = (end - reached).dt.days.to_numpy()
+    dead = dead.to_numpy()
+
+    # Kaplan-Meier: at each day on which someone died, multiply in the fraction of those
+    # still followed who survived it
+    surviving, curve = 1.0, []
+    for day in np.unique(days[dead]):
+        at_risk = (days >= day).sum()
+        surviving *= 1 - ((days == day) & dead).sum() / at_risk
+        curve.append((day, surviving))
+
+    def surviving_at(horizon):
+        if days.size == 0 or horizon > days.max():
+            return None  # Nobody followed that long
+        return round(next((s for day, s in reversed(curve) if day <= horizon), 1.0), 3)
+
+    median = next((int(day) for day, s in curve if s <= 0.5), None)
+    return {
+        "people": int(len(days)),
+        "deaths": int(dead.sum()),
+        "median_days": median,
+        "survival": {horizon: surviving_at(horizon) for horizon in horizons},
+    }
+
+
+def main(argv=None):
+    """
+    Command line entry point.
+
+    Parameters:
+    argv (list): The command line arguments. If None, uses sys.argv.
+
+    Returns:
+    None
+    """
+    parser = argparse.ArgumentParser(
+        description="Ask questions about the history of the Alivewatch list."
+    )
+    parser.add_argument(
+        "--history", default=history.HISTORY_DIR, help="the history directory"
+    )
+    parser.add_argument(
+        "--index", default=INDEX_PATH, help="where to cache the history index"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("trajectory", help="a person's priority on each day")
+    command.add_argument("name", help="the person's name, or part of it")
+    command.add_argument(
+        "--all", action="store_true", help="show every day, not just the changes"
+    )
+    command = commands.add_parser(
+        "time-on-watch", help="how long people have been on the list"
+    )
+    command.add_argument("--name", help="only people whose name contains this")
+    command.add_argument("--limit", type=int, default=20, help="rows to show")
+    command = commands.add_parser(
+        "hits", help="deaths under watch vs missed, by notability rank band"
+    )
+    command.add_argument(
+        "--dataset", help="where to find notability ranks (default: the watch table)"
+    )
+    command = commands.add_parser(
+        "survival", help="how long people survive after reaching the top places"
+    )
+    command.add_argument("--top", type=int, default=10, help="top places")
+    args = parser.parse_args(argv)
+
+    pd.set_option("display.width", 200)
+    died = latest_report("Died_under_watch", args.history)
+    if args.command == "hits":
+        if args.dataset is not None and not os.path.exists(args.dataset):
+            print(f"❌ {args.dataset} not found")
+            return
+        missed = latest_report("Missed_by_alivewatch", args.history)
+        print(hit_rates(died, missed, notability_ranks(args.dataset)).to_string())
+        return
+
+    index = load_index(args.history, args.index)
+    if args.command == "trajectory":
+        names = index.find(args.name)
+        if len(names) != 1:
+            print(
+                f"⚠️ {len(names)} people match {args.name!r}: " + ", ".join(names[:20])
+            )
+            return
+        path = trajectory(index, names[0])
+        if not args.all:
+            # Just the days on which the priority changed, plus the last day
+            changed = path["Priority Rank"].diff().ne(0)
+            changed.iloc[-1:] = True
+            path = path[changed]
+        print(names[0])
+        print(path.to_string(index=False))
+    elif args.command == "time-on-watch":
+        frame = time_on_watch(index, died)
+        if args.name:
+            frame = frame[frame["Name"].isin(index.find(args.name))]
+        print(frame.head(args.limit).to_string(index=False))
+    elif args.command == "survival":
+        result = survival(index, died, args.top)
+        print(
+            f"{result['people']} people reached the top {args.top}, "
+            f"of whom {result['deaths']} have died"
+        )
+        median = result["median_days"]
+        print(
+            "Median survival: "
+            + (f"{median} days" if median is not None else "over half still alive")
+        )
+        for horizon, rate in result["survival"].items():
+            shown = "not enough history" if rate is None else f"{rate:.1%}"
+            print(f"Surviving {horizon} days: {shown}")
+
+
+if __name__ == "__main__":
+    main()
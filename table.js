@@ -0,0 +1,99 @@
+// Shows a report from the precomputed pages in data/pages (see pages.py).
+// The first rows come in one small file; more are fetched a page at a time when asked for,
+// and the search index is only fetched when someone starts typing in the search box.
+function showReport(report) {
+    const base = 'data/pages/' + report + '/';
+    const tableHead = document.getElementById('table-head');
+    const tableBody = document.getElementById('table-body');
+    const searchBody = document.getElementById('search-body');
+    const showMore = document.getElementById('show-more');
+    const search = document.getElementById('search');
+    const pages = {};
+    let info = null;
+    let shown = 0;
+    let index = null;
+    let latestSearch = 0;
+
+    function getJSON(name) {
+        return fetch(base + name).then(response => response.json());
+    }
+
+    function getPage(number) {
+        if (!(number in pages)) pages[number] = getJSON('page-' + number + '.json');
+        return pages[number];
+    }
+
+    function addRow(body, row) {
+        let tr = document.createElement('tr');
+        row.forEach(value => {
+            let cell = document.createElement('td');
+            cell.textContent = value;
+            tr.appendChild(cell);
+        });
+        body.appendChild(tr);
+    }
+
+    // The same as search_text in pages.py: lower case, without accents
+    function searchText(text) {
+        return text.normalize('NFD').replace(/\p{M}/gu, '').replace(/\s+/g, ' ').trim().toLowerCase();
+    }
+
+    function updateShowMore() {
+        showMore.hidden = tableBody.hidden || shown >= info.total;
+    }
+
+    getJSON('first.json').then(first => {
+        info = first;
+        let tr = document.createElement('tr');
+        first.columns.forEach(column => {
+            let cell = document.createElement('th');
+            cell.textContent = column;
+            tr.appendChild(cell);
+        });
+        tableHead.appendChild(tr);
+        first.rows.forEach(row => addRow(tableBody, row));
+        shown = first.rows.length;
+        updateShowMore();
+    });
+
+    showMore.addEventListener('click', () => {
+        const number = Math.floor(shown / info.page_size) + 1;
+        showMore.disabled = true;
+        getPage(number).then(rows => {
+            rows.slice(shown - (number - 1) * info.page_size).forEach(row => addRow(tableBody, row));
+            shown = Math.min(number * info.page_size, info.total);
+            showMore.disabled = false;
+            updateShowMore();
+        });
+    });
+
+    search.addEventListener('input', () => {
+        if (!info) return; // Still loading
+        const query = searchText(search.value);
+        const thisSearch = ++latestSearch;
+        if (query.length < 2) {
+            searchBody.hidden = true;
+            tableBody.hidden = false;
+            updateShowMore();
+            return;
+        }
+        (index ? Promise.resolve(index) : getJSON('search.json')).then(loaded => {
+            index = loaded;
+            const matches = [];
+            index.forEach((text, i) => {
+                if (text.includes(query) && matches.length < 200) matches.push(i);
+            });
+            // Each page is only fetched once, however many matches are on it
+            return Promise.all(matches.map(i =>
+                getPage(Math.floor(i / info.page_size) + 1).then(rows => rows[i % info.page_size])
+            ));
+        }).then(rows => {
+            if (thisSearch !== latestSearch) return; // A newer search has started
+            searchBody.replaceChildren();
+            rows.forEach(row => addRow(searchBody, row));
+            searchBody.hidden = false;
+            tableBody.hidden = true;
+            updateShowMore();
+        });
+    });
+}